@@ -485,14 +485,12 @@ def recall(
     
     # Just list environments if requested
     if list_envs:
-        environments = SafeEnvironment.list_saved_environments()
-        
-        if not environments:
-            log_status("No saved environments found", Colors.YELLOW)
-            return
-        
-        log_status("Saved environments:", Colors.BLUE)
-        for env in environments:
+        found = False
+        for env in SafeEnvironment.iter_saved_environments():
+            if not found:
+                log_status("Saved environments:", Colors.BLUE)
+                found = True
+            
             created = datetime.fromisoformat(env.get("created_at", "")).strftime("%Y-%m-%d %H:%M")
             accessed = datetime.fromisoformat(env.get("last_accessed", "")).strftime("%Y-%m-%d %H:%M")
             
@@ -502,7 +500,9 @@ def recall(
             print(f"    Created: {created}")
             print(f"    Last accessed: {accessed}")
             print()
-            
+        
+        if not found:
+            log_status("No saved environments found", Colors.YELLOW)
         return
     
     # Ensure we have an ID or name
@@ -11,9 +11,10 @@ import os
 import platform
 import subprocess
 import tempfile
+import threading
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Dict, List, Tuple, Any, Union
+from typing import Optional, Dict, List, Set, Tuple, Any, Union
 
 from .utils import log_status, Colors, run_command, sudo_command, is_command_available
 from .settings import get_settings
@@ -21,6 +22,11 @@ from .settings import get_settings
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# (runtime, image) pairs already pulled by this process, shared by all
+# container managers so repeated environments skip the registry round-trip
+_pulled_images: Set[Tuple[str, str]] = set()
+_pulled_images_lock = threading.Lock()
+
 @dataclass
 class ContainerConfig:
     """Container Configuration"""
@@ -152,17 +158,8 @@ class ContainerManager:
         self.container_dir.mkdir(parents=True, exist_ok=True)
         
         # Pull container image
-        pull_cmd = f"{self.container_runtime} pull {self.config.image}"
-        result = run_command(pull_cmd)
-        if result.returncode != 0:
-            if self.sudo_password:
-                result = sudo_command(pull_cmd, self.sudo_password)
-                if result.returncode != 0:
-                    log_status(f"Failed to pull container image: {result.stderr}", Colors.RED)
-                    return False
-            else:
-                log_status(f"Failed to pull container image: {result.stderr}", Colors.RED)
-                return False
+        if not self._pull_image():
+            return False
         
         # Create container network if network is enabled
         if self.config.network_enabled:
@@ -191,6 +188,35 @@ class ContainerManager:
         log_status("Container environment setup complete", Colors.GREEN)
         return True
     
+    def _pull_image(self) -> bool:
+        """
+        Pull the container image unless this process already pulled it.
+        
+        Returns:
+            bool: True if the image is available, False otherwise
+        """
+        key = (self.container_runtime, self.config.image)
+        with _pulled_images_lock:
+            if key in _pulled_images:
+                logger.debug(f"Container image {self.config.image} already pulled")
+                return True
+        
+        pull_cmd = f"{self.container_runtime} pull {self.config.image}"
+        result = run_command(pull_cmd)
+        if result.returncode != 0:
+            if self.sudo_password:
+                result = sudo_command(pull_cmd, self.sudo_password)
+                if result.returncode != 0:
+                    log_status(f"Failed to pull container image: {result.stderr}", Colors.RED)
+                    return False
+            else:
+                log_status(f"Failed to pull container image: {result.stderr}", Colors.RED)
+                return False
+        
+        with _pulled_images_lock:
+            _pulled_images.add(key)
+        return True
+    
     def _create_container_script(self) -> None:
         """Create container run script"""
         # Create container run script
@@ -10,7 +10,7 @@ import shutil
 import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union, Any
+from typing import Dict, Iterator, List, Optional, Tuple, Union, Any
 import uuid
 
 from .utils import (
@@ -35,6 +35,103 @@ from .state_db import get_state_db
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# README written into internal testing environments; built once at import
+_INTERNAL_README = '''# Internal Testing Environment
+
+This is an isolated testing environment created by safespace.
+
+## Directory Structure
+- `src/`: Source code under test
+- `tests/`: Test files and fixtures
+- `data/`: Test data directory
+- `config/`: Configuration files
+- `logs/`: Log files
+
+## Environment Management
+- Create/recreate environment: `safespace internal`
+- Clean environment: `safespace internal cleanup` or `safespace internal -c`
+  - Removes cache files, logs, and temporary data
+  - Cleans virtual environment
+  - Preserves source code and tests
+  - Resets permissions
+- Remove environment completely: `safespace foreclose`
+  - Completely removes the environment and all backups
+  - Cleans up all associated cache files
+  - Removes environment entries from .gitignore
+  - Cannot be undone
+
+## Setup
+1. Create a virtual environment:
+   ```bash
+   python -m venv venv
+   source venv/bin/activate  # or 'venv\\Scripts\\activate' on Windows
+   ```
+
+2. Install dependencies:
+   ```bash
+   pip install -r requirements.txt
+   ```
+
+3. Set up pre-commit hooks:
+   ```bash
+   pre-commit install
+   ```
+
+## Development Tools
+- **Code Formatting**: Black and isort
+- **Linting**: Flake8, Pylint
+- **Type Checking**: MyPy
+- **Security**: Bandit
+- **Testing**: Pytest with plugins for coverage, benchmarking, async, and property-based testing
+- **Test Data**: Faker for generating test data
+- **Mocking**: pytest-mock and responses for HTTP mocking
+- **Development**: Rich for better output formatting
+
+## Running Tests
+Basic test run:
+```bash
+pytest tests/
+```
+
+With coverage report:
+```bash
+pytest tests/ --cov=src --cov-report=html
+```
+
+Run benchmarks:
+```bash
+pytest tests/ --benchmark-only
+```
+
+Property-based tests:
+```bash
+pytest tests/ -v -k "test_property"
+```
+
+## Code Quality
+Run all quality checks:
+```bash
+# Format code
+black .
+isort .
+
+# Run linters
+flake8
+pylint src tests
+
+# Type checking
+mypy src tests
+
+# Security check
+bandit -r src
+```
+
+## Configuration
+- `setup.cfg`: Contains configuration for pytest, coverage, mypy, and other tools
+- `.pre-commit-config.yaml`: Git pre-commit hook configuration
+- `requirements.txt`: Project dependencies
+'''
+
 class SafeEnvironment:
     """Manages an isolated environment for testing and development"""
     
@@ -464,12 +561,9 @@ class SafeEnvironment:
         Returns:
             bool: True if setup was successful, False otherwise
         """
-        # Get settings
-        settings = get_settings()
-        testing_settings = settings.testing
-        
+        # Repeat calls (e.g. from several templates) are a no-op
         if self.test_environment is not None and self.comprehensive_test_enabled:
-            logger.warning("Comprehensive testing environment already set up")
+            logger.debug("Comprehensive testing environment already set up")
             return True
             
         # Create test environment manager if it doesn't exist
@@ -494,12 +588,9 @@ class SafeEnvironment:
         Returns:
             bool: True if setup was successful, False otherwise
         """
-        # Get settings
-        settings = get_settings()
-        enhanced_dev_settings = settings.enhanced_dev
-        
+        # Repeat calls (e.g. from several templates) are a no-op
         if self.test_environment is not None and self.enhanced_dev_enabled:
-            logger.warning("Enhanced development environment already set up")
+            logger.debug("Enhanced development environment already set up")
             return True
             
         # Create test environment manager if it doesn't exist
@@ -803,6 +894,16 @@ class SafeEnvironment:
         environments = db.list_environments()
         return environments
     
+    @staticmethod
+    def iter_saved_environments() -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over all saved environments, reading them as they are consumed.
+        
+        Yields:
+            Dictionaries containing environment summary information
+        """
+        return get_state_db().iter_environments()
+    
     def delete_saved_state(self) -> bool:
         """
         Delete this environment's saved state from the database.
@@ -963,102 +1064,7 @@ data/*
         (logs_dir / ".gitkeep").touch()
         
         # Create README
-        with open(self.root_dir / "README.md", "w") as f:
-            f.write(f'''# Internal Testing Environment
-
-This is an isolated testing environment created by safespace.
-
-## Directory Structure
-- `src/`: Source code under test
-- `tests/`: Test files and fixtures
-- `data/`: Test data directory
-- `config/`: Configuration files
-- `logs/`: Log files
-
-## Environment Management
-- Create/recreate environment: `safespace internal`
-- Clean environment: `safespace internal cleanup` or `safespace internal -c`
-  - Removes cache files, logs, and temporary data
-  - Cleans virtual environment
-  - Preserves source code and tests
-  - Resets permissions
-- Remove environment completely: `safespace foreclose`
-  - Completely removes the environment and all backups
-  - Cleans up all associated cache files
-  - Removes environment entries from .gitignore
-  - Cannot be undone
-
-## Setup
-1. Create a virtual environment:
-   ```bash
-   python -m venv venv
-   source venv/bin/activate  # or 'venv\\Scripts\\activate' on Windows
-   ```
-
-2. Install dependencies:
-   ```bash
-   pip install -r requirements.txt
-   ```
-
-3. Set up pre-commit hooks:
-   ```bash
-   pre-commit install
-   ```
-
-## Development Tools
-- **Code Formatting**: Black and isort
-- **Linting**: Flake8, Pylint
-- **Type Checking**: MyPy
-- **Security**: Bandit
-- **Testing**: Pytest with plugins for coverage, benchmarking, async, and property-based testing
-- **Test Data**: Faker for generating test data
-- **Mocking**: pytest-mock and responses for HTTP mocking
-- **Development**: Rich for better output formatting
-
-## Running Tests
-Basic test run:
-```bash
-pytest tests/
-```
-
-With coverage report:
-```bash
-pytest tests/ --cov=src --cov-report=html
-```
-
-Run benchmarks:
-```bash
-pytest tests/ --benchmark-only
-```
-
-Property-based tests:
-```bash
-pytest tests/ -v -k "test_property"
-```
-
-## Code Quality
-Run all quality checks:
-```bash
-# Format code
-black .
-isort .
-
-# Run linters
-flake8
-pylint src tests
-
-# Type checking
-mypy src tests
-
-# Security check
-bandit -r src
-```
-
-## Configuration
-- `setup.cfg`: Contains configuration for pytest, coverage, mypy, and other tools
-- `.pre-commit-config.yaml`: Git pre-commit hook configuration
-- `requirements.txt`: Project dependencies
-''')
+        (self.root_dir / "README.md").write_text(_INTERNAL_README)
     
     def cleanup_internal(self) -> None:
         """Clean up the internal environment"""
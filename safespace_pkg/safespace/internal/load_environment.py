@@ -61,8 +61,10 @@ def load_environment_file(env_file: Path) -> Dict[str, str]:
 
 def set_environment_variables(env_vars: Dict[str, str]) -> None:
     """Set environment variables from a dictionary"""
-    for key, value in env_vars.items():
-        os.environ[key] = value
+    # Skip values that are already set so repeated loads don't re-putenv
+    os.environ.update(
+        {key: value for key, value in env_vars.items() if os.environ.get(key) != value}
+    )
 
 def load_environment(env_file: Optional[Path] = None) -> Dict[str, str]:
     """Load the environment configuration"""
@@ -6,40 +6,175 @@ It creates isolated network namespaces and configures virtual interfaces for
 complete network isolation.
 """
 
+import asyncio
+import atexit
+import ctypes
+import functools
 import logging
 import os
 import platform
+import queue
+import select
+import shlex
+import shutil
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional, List, Tuple, Dict, Any
+from typing import Optional, List, Tuple, Dict, Any, Union
 
 from .utils import log_status, Colors
 from .settings import get_settings
 
+try:
+    from pyroute2 import IPRoute, NetNS, netns
+except ImportError:  # Optional dependency, see the "network" extra
+    IPRoute = NetNS = netns = None
+
 logger = logging.getLogger(__name__)
 
+# The platform can't change at runtime, so detect it once
+_SYSTEM = platform.system()
+_IS_LINUX = _SYSTEM == "Linux"
+_IS_MACOS = _SYSTEM == "Darwin"
+
+# Markers used to frame commands sent to the persistent sudo shell
+_SHELL_READY = "__SAFESPACE_READY__"
+_SHELL_DONE = "__SAFESPACE_DONE__"
+# Seconds to wait for sudo to authenticate the persistent shell
+_SHELL_START_TIMEOUT = 10
+# Seconds to wait for a command's stderr sentinel once its stdout one arrived
+_SHELL_STDERR_TIMEOUT = 10
+# Absolute path so subprocess can use its posix_spawn fast path
+_SUDO = shutil.which("sudo") or "/usr/bin/sudo"
+# Seconds between sudo ticket refreshes, inside sudo's default 5 minute timeout
+_SUDO_REFRESH_INTERVAL = 240
+# What sudo -n reports when it has no ticket to run against
+_SUDO_PASSWORD_REQUIRED = "a password is required"
+# pf anchors holding our rules, so the host's ruleset is never replaced or
+# edited. macOS's stock /etc/pf.conf already evaluates anchor and
+# dummynet-anchor "com.apple/*", so rules loaded under it take effect
+# without touching that file.
+_PF_ANCHOR = "com.apple/safespace"
+_PF_CONDITIONS_ANCHOR = "com.apple/safespace-conditions"
+
+class _LazyJoin:
+    """Space-join an argv only if a log record actually gets formatted"""
+    __slots__ = ("argv",)
+
+    def __init__(self, argv: List[str]):
+        self.argv = argv
+
+    def __str__(self) -> str:
+        return " ".join(self.argv)
+
+def _write_file_atomic(path: Path, payload: bytes) -> None:
+    """
+    Write a file in one syscall and swap it into place atomically.
+
+    Readers such as pfctl never observe a half-written file.
+
+    Args:
+        path: Destination file
+        payload: Complete file contents
+    """
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        os.write(fd, payload)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+
+# netem options in the order tc expects them: (keyword, argument builder).
+# A builder returns no arguments when its condition is disabled.
+_NETEM_SPEC = (
+    ("delay", lambda net: ([net.latency, net.jitter] if net.jitter else [net.latency]) if net.latency else []),
+    ("loss", lambda net: [f"{net.packet_loss}%"] if net.packet_loss > 0 else []),
+    ("corrupt", lambda net: [f"{net.packet_corruption}%"] if net.packet_corruption > 0 else []),
+    ("reorder", lambda net: [f"{net.packet_reordering}%"] if net.packet_reordering > 0 else []),
+)
+
+@functools.lru_cache(maxsize=32)
+def _parse_cidr(cidr: str) -> Tuple[str, str, str]:
+    """
+    Derive the host, namespace and tap addresses from a /24 subnet.
+
+    Args:
+        cidr: Subnet in CIDR notation, e.g. "192.168.100.0/24"
+
+    Returns:
+        Tuple of (host_ip, namespace_ip, tap_ip)
+    """
+    base_ip = cidr.split('/')[0].rsplit('.', 1)[0]
+    return f"{base_ip}.1", f"{base_ip}.2", f"{base_ip}.3"
+
+def _heredoc(cmd: List[str], lines: List[str]) -> str:
+    """
+    Build a shell command that reads its input from a quoted here-document.
+
+    Args:
+        cmd: Command to run
+        lines: Lines fed to the command on stdin
+
+    Returns:
+        Shell snippet running cmd with lines on stdin
+    """
+    body = "\n".join(lines)
+    return f"{shlex.join(cmd)} <<'EOF'\n{body}\nEOF"
+
 class NetworkIsolation:
     """Manages network isolation features for SafeSpace environments."""
 
-    def __init__(self, env_dir: Path, sudo_password: Optional[str] = None):
+    def __init__(self, env_dir: Path, sudo_password: Optional[Union[str, bytes, bytearray]] = None):
         """
         Initialize NetworkIsolation.
 
         Args:
             env_dir: Path to the environment directory
-            sudo_password: Optional sudo password for privileged operations
+            sudo_password: Optional sudo password for privileged operations;
+                it is copied, and the caller's value is never modified
         """
         # Get settings
         settings = get_settings()
         network_settings = settings.network
         
         self.env_dir = env_dir
-        self.sudo_password = sudo_password
+        # Our own copy, kept as mutable bytes so it can be zeroed in place
+        # when this object is collected; a buffer passed in by the caller
+        # may still be in use elsewhere, so it is never wiped
+        self.sudo_password: Optional[bytearray] = None
+        if sudo_password:
+            self.sudo_password = bytearray(
+                sudo_password.encode("utf-8") if isinstance(sudo_password, str) else sudo_password
+            )
         self.namespace_name = "safespace_net"
         self.veth_host = "veth0"
         self.veth_namespace = "veth1"
-        self.is_linux = platform.system() == "Linux"
-        self.is_macos = platform.system() == "Darwin"
+        self.is_linux = _IS_LINUX
+        self.is_macos = _IS_MACOS
+        # Already-privileged processes can skip sudo altogether
+        self._is_root = hasattr(os, "geteuid") and os.geteuid() == 0
+        # Long-lived root shell, started on first privileged command
+        self._sudo_shell: Optional[subprocess.Popen] = None
+        self._sudo_shell_errors: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._sudo_shell_seq = 0
+        # Serializes use of the shell, whose pipes carry one command at a time
+        self._sudo_shell_lock = threading.Lock()
+        # Set once a sudo timestamp ticket has been obtained with sudo -v
+        self._sudo_primed = False
+        self._sudo_refresh_timer: Optional[threading.Timer] = None
+        # Loopback address the HOSTALIASES file was last written for
+        self._hostaliases_ip: Optional[str] = None
+        # Resolve tools once so neither sudo nor the child searches PATH
+        self._ip = shutil.which("ip") or "/usr/sbin/ip"
+        self._iptables = shutil.which("iptables") or "/usr/sbin/iptables"
+        self._iptables_restore = shutil.which("iptables-restore") or "/usr/sbin/iptables-restore"
+        self._ifconfig = shutil.which("ifconfig") or "/sbin/ifconfig"
+        self._pfctl = shutil.which("pfctl") or "/sbin/pfctl"
+        self._dnctl = shutil.which("dnctl") or "/usr/sbin/dnctl"
+        self._kldload = shutil.which("kldload") or "/sbin/kldload"
         
         # Apply settings
         self.network_cidr = network_settings.default_subnet
@@ -55,10 +190,11 @@ class NetworkIsolation:
         self.packet_reordering = network_settings.default_packet_reordering
         self.bandwidth = network_settings.default_bandwidth
         self.current_conditions_active = False
+        # Parameters of the conditions currently installed, if any
+        self._applied_conditions: Optional[tuple] = None
         
         # Extract network components from CIDR
-        network_parts = self.network_cidr.split('/')
-        base_ip = network_parts[0].rsplit('.', 1)[0]
+        self.host_ip, self.namespace_ip, self.tap_ip = _parse_cidr(self.network_cidr)
         
         # Platform-specific settings
         if self.is_macos:
@@ -66,127 +202,580 @@ class NetworkIsolation:
         else:
             self.tap_interface = "tap0"
             
-        self.host_ip = f"{base_ip}.1"
-        self.namespace_ip = f"{base_ip}.2"
-        self.tap_ip = f"{base_ip}.3"
+        self._host_cidr = f"{self.host_ip}/24"
+        self._ns_cidr = f"{self.namespace_ip}/24"
         self.env_file = env_dir / ".env"
         
-    def _sudo_cmd(self, cmd: List[str]) -> Tuple[int, str, str]:
+        # Platform handlers, picked once instead of branching on every call
+        self._setup_fn = {
+            "Linux": self._setup_linux,
+            "Darwin": self._setup_macos,
+        }.get(_SYSTEM, self._setup_unsupported)
+        self._cleanup_fn = {
+            "Linux": self._cleanup_linux,
+            "Darwin": self._cleanup_macos,
+        }.get(_SYSTEM, self._cleanup_unsupported)
+        self._run_command_fn = {
+            "Linux": self._run_command_linux,
+            "Darwin": self._run_command_macos,
+        }.get(_SYSTEM, self._run_command_unsupported)
+        
+    def _sudo_cmd(self, cmd: List[str], env: Optional[Dict[str, str]] = None) -> Tuple[int, str, str]:
         """
         Run a command with sudo privileges.
 
+        When the process is already running as root the command is executed
+        directly, without sudo or a password.
+
         Args:
             cmd: Command to run as a list of strings
+            env: Optional extra environment variables for the command
 
         Returns:
             Tuple of (return_code, stdout, stderr)
         """
-        logger.debug(f"Running sudo command: {' '.join(cmd)}")
+        logger.debug("Running sudo command: %s", _LazyJoin(cmd))
+        
+        if self._is_root:
+            try:
+                result = subprocess.run(cmd, capture_output=True, close_fds=False,
+                                        env={**os.environ, **env} if env else None)
+                return (result.returncode,
+                        result.stdout.decode("utf-8", "replace"),
+                        result.stderr.decode("utf-8", "replace"))
+            except Exception as e:
+                logger.error(f"Error running privileged command: {e}")
+                return 1, "", str(e)
         
+        error = self._authorize_sudo()
+        if error:
+            return 1, "", error
+            
+        with self._sudo_shell_lock:
+            shell = self._ensure_sudo_shell()
+            if shell is not None:
+                result = self._sudo_shell_cmd(shell, cmd, env)
+                if result is not None:
+                    return result
+        # No usable shell; fall back to a one-off sudo process
+        return self._sudo_popen(cmd, env)
+
+    def _authorize_sudo(self) -> Optional[str]:
+        """
+        Make sure sudo can run without prompting, priming the ticket if needed.
+
+        Returns:
+            None when privileged commands can run, otherwise an error message
+        """
+        if self._is_root or self._sudo_primed:
+            return None
         if not self.sudo_password:
             logger.error("No sudo password set")
-            return 1, "", "No sudo password provided"
-            
-        full_cmd = ["sudo", "-S"] + cmd
+            return "No sudo password provided"
+        if not self._prime_sudo():
+            return "sudo authentication failed"
+        return None
+
+    async def _sudo_cmd_async(self, cmd: List[str]) -> Tuple[int, str, str]:
+        """
+        Run a command with sudo privileges without blocking the event loop.
+
+        Args:
+            cmd: Command to run as a list of strings
+
+        Returns:
+            Tuple of (return_code, stdout, stderr)
+        """
+        logger.debug("Running sudo command: %s", _LazyJoin(cmd))
         
+        error = self._authorize_sudo()
+        if error:
+            return 1, "", error
+            
+        if self._is_root:
+            return await self._spawn_async(cmd)
+            
+        result = await self._spawn_async([_SUDO, "-n", *cmd])
+        if result[0] != 0 and self._needs_password(result[2]):
+            # No usable ticket, so authenticate this command on its own
+            payload = self.sudo_password + b"\n"
+            try:
+                result = await self._spawn_async([_SUDO, "-S", "-p", "", *cmd], payload)
+            finally:
+                self._zero_buffer(payload)
+        return result
+
+    @staticmethod
+    async def _spawn_async(full_cmd: List[str], payload: Optional[bytearray] = None) -> Tuple[int, str, str]:
+        """
+        Run a process without blocking the event loop and collect its output.
+
+        Args:
+            full_cmd: Command to run, including sudo if needed
+            payload: Optional bytes to send on stdin
+
+        Returns:
+            Tuple of (return_code, stdout, stderr)
+        """
         try:
-            process = subprocess.Popen(
-                full_cmd,
-                stdin=subprocess.PIPE,
+            process = await asyncio.create_subprocess_exec(
+                *full_cmd,
+                stdin=subprocess.PIPE if payload is not None else subprocess.DEVNULL,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True
+                close_fds=False
             )
-            stdout, stderr = process.communicate(input=f"{self.sudo_password}\n")
-            return process.returncode, stdout, stderr
+            stdout, stderr = await process.communicate(payload)
+            return (process.returncode,
+                    stdout.decode("utf-8", "replace"),
+                    stderr.decode("utf-8", "replace"))
         except Exception as e:
             logger.error(f"Error running sudo command: {e}")
             return 1, "", str(e)
 
-    def setup(self) -> bool:
+    async def _sudo_gather(self, cmds: List[List[str]]) -> List[Tuple[int, str, str]]:
         """
-        Set up network isolation.
+        Run independent privileged commands concurrently.
+
+        Args:
+            cmds: Commands to run, each as a list of strings
 
         Returns:
-            bool: True if setup was successful, False otherwise
+            List of (return_code, stdout, stderr) tuples, in the order of cmds
         """
-        log_status("Setting up network isolation...", Colors.YELLOW)
-        
-        if self.is_linux:
-            return self._setup_linux()
-        elif self.is_macos:
-            return self._setup_macos()
-        else:
-            log_status("Network isolation is only supported on Linux and macOS", Colors.RED)
-            return False
+        return await asyncio.gather(*(self._sudo_cmd_async(cmd) for cmd in cmds))
 
-    def _setup_linux(self) -> bool:
+    def _prime_sudo(self) -> bool:
         """
-        Set up network isolation on Linux using network namespaces.
+        Authenticate once with sudo -v and keep the timestamp ticket fresh.
+
+        Later sudo invocations run with -n against the cached ticket, so
+        the password is normally sent and PAM consulted only once. The
+        password is still kept: commands fall back to sending it with -S
+        when sudo has no usable ticket (see _needs_password()).
 
         Returns:
-            bool: True if setup was successful, False otherwise
+            bool: True if sudo accepted the password, False otherwise
         """
-        # Create a new network namespace
-        rc, _, stderr = self._sudo_cmd(["ip", "netns", "add", self.namespace_name])
-        if rc != 0:
-            logger.error(f"Failed to create network namespace: {stderr}")
+        payload = self.sudo_password + b"\n"
+        try:
+            result = subprocess.run(
+                [_SUDO, "-S", "-p", "", "-v"],
+                input=payload,
+                capture_output=True,
+                close_fds=False,
+                timeout=_SHELL_START_TIMEOUT
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.error(f"Error authenticating with sudo: {e}")
             return False
+        finally:
+            self._zero_buffer(payload)
             
-        # Create virtual interface pair
-        rc, _, stderr = self._sudo_cmd(["ip", "link", "add", self.veth_host, "type", "veth", "peer", "name", self.veth_namespace])
-        if rc != 0:
-            logger.error(f"Failed to create virtual interfaces: {stderr}")
+        if result.returncode != 0:
+            logger.error(f"sudo authentication failed: {result.stderr.decode('utf-8', 'replace').strip()}")
             return False
             
-        # Move veth1 to namespace
-        rc, _, stderr = self._sudo_cmd(["ip", "link", "set", self.veth_namespace, "netns", self.namespace_name])
-        if rc != 0:
-            logger.error(f"Failed to move interface to namespace: {stderr}")
-            return False
+        self._sudo_primed = True
+        self._schedule_sudo_refresh()
+        return True
+
+    def _needs_password(self, stderr: str) -> bool:
+        """
+        Check whether a sudo -n command failed for lack of a ticket.
+
+        That happens when the ticket expired or could not be refreshed, when
+        timestamp_timeout is 0, or when tickets are per terminal. The command
+        can then be retried with the stored password.
+
+        Args:
+            stderr: Error output of the failed command
+
+        Returns:
+            bool: True if the command should be retried with the password
+        """
+        return bool(self.sudo_password) and _SUDO_PASSWORD_REQUIRED in stderr
+
+    def _shred_password(self) -> None:
+        """Overwrite our copy of the sudo password with zeros and drop it"""
+        password = getattr(self, "sudo_password", None)
+        if password is not None:
+            self._zero_buffer(password)
+            self.sudo_password = None
+
+    @staticmethod
+    def _zero_buffer(buffer: bytearray) -> None:
+        """Zero a bytearray in place"""
+        if buffer:
+            ctypes.memset((ctypes.c_char * len(buffer)).from_buffer(buffer), 0, len(buffer))
+
+    def _schedule_sudo_refresh(self) -> None:
+        """Refresh the sudo ticket in the background before it expires"""
+        timer = threading.Timer(_SUDO_REFRESH_INTERVAL, self._refresh_sudo)
+        timer.daemon = True
+        timer.start()
+        self._sudo_refresh_timer = timer
+
+    def _refresh_sudo(self) -> None:
+        """Extend the sudo ticket with sudo -n -v"""
+        try:
+            result = subprocess.run([_SUDO, "-n", "-v"], capture_output=True, close_fds=False)
+        except OSError as e:
+            logger.debug(f"Could not refresh sudo ticket: {e}")
+            self._sudo_primed = False
+            return
             
-        # Configure interfaces
-        rc, _, stderr = self._sudo_cmd(["ip", "addr", "add", f"{self.host_ip}/24", "dev", self.veth_host])
-        if rc != 0:
-            logger.error(f"Failed to configure host interface: {stderr}")
-            return False
+        if result.returncode == 0:
+            self._schedule_sudo_refresh()
+        else:
+            logger.debug("sudo ticket expired")
+            self._sudo_primed = False
+
+    def _cancel_sudo_refresh(self) -> None:
+        """Stop refreshing the sudo ticket"""
+        timer, self._sudo_refresh_timer = self._sudo_refresh_timer, None
+        if timer is not None:
+            timer.cancel()
+
+    def _sudo_popen(self, cmd: List[str], env: Optional[Dict[str, str]] = None) -> Tuple[int, str, str]:
+        """
+        Run a command through a dedicated, one-off sudo process.
+
+        Args:
+            cmd: Command to run as a list of strings
+            env: Optional extra environment variables for the command
+
+        Returns:
+            Tuple of (return_code, stdout, stderr)
+        """
+        # sudo resets the environment, so extra variables go through env(1)
+        if env:
+            cmd = ["env", *(f"{key}={value}" for key, value in env.items()), *cmd]
+        
+        result = self._spawn((_SUDO, "-n", *cmd))
+        if result[0] != 0 and self._needs_password(result[2]):
+            # No usable ticket, so authenticate this command on its own
+            payload = self.sudo_password + b"\n"
+            try:
+                result = self._spawn((_SUDO, "-S", "-p", "", *cmd), payload)
+            finally:
+                self._zero_buffer(payload)
+        return result
+
+    @staticmethod
+    def _spawn(full_cmd: Tuple[str, ...], payload: Optional[bytearray] = None) -> Tuple[int, str, str]:
+        """
+        Run a process and collect its output.
+
+        Args:
+            full_cmd: Command to run, including sudo
+            payload: Optional bytes to send on stdin
+
+        Returns:
+            Tuple of (return_code, stdout, stderr)
+        """
+        try:
+            # Binary pipes: the small outputs are decoded once at the end.
+            # close_fds=False (our own fds are non-inheritable anyway) keeps
+            # subprocess on posix_spawn instead of fork+exec.
+            process = subprocess.Popen(
+                full_cmd,
+                stdin=subprocess.PIPE if payload is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=-1,
+                close_fds=False
+            )
+            stdout, stderr = process.communicate(payload)
+            return (process.returncode,
+                    stdout.decode("utf-8", "replace"),
+                    stderr.decode("utf-8", "replace"))
+        except Exception as e:
+            logger.error(f"Error running sudo command: {e}")
+            return 1, "", str(e)
+
+    def _ensure_sudo_shell(self) -> Optional[subprocess.Popen]:
+        """
+        Return the persistent root shell, starting it on first use.
+
+        The shell is started against the primed sudo ticket; every later
+        privileged command is piped into it instead of paying for a new
+        sudo session.
+
+        Returns:
+            The running shell process, or None if it could not be started
+        """
+        shell = self._sudo_shell
+        if shell is not None and shell.poll() is None:
+            return shell
             
-        rc, _, stderr = self._sudo_cmd(["ip", "netns", "exec", self.namespace_name, "ip", "addr", "add", f"{self.namespace_ip}/24", "dev", self.veth_namespace])
-        if rc != 0:
-            logger.error(f"Failed to configure namespace interface: {stderr}")
-            return False
+        shell = None
+        try:
+            shell = subprocess.Popen(
+                [_SUDO, "-n", "sh", "-c", f"echo {_SHELL_READY}; exec sh"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                close_fds=False
+            )
             
-        # Bring up interfaces
-        rc, _, stderr = self._sudo_cmd(["ip", "link", "set", self.veth_host, "up"])
-        if rc != 0:
-            logger.error(f"Failed to bring up host interface: {stderr}")
-            return False
+            ready, _, _ = select.select([shell.stdout], [], [], _SHELL_START_TIMEOUT)
+            if not ready or shell.stdout.readline().strip() != _SHELL_READY.encode():
+                raise RuntimeError("sudo authentication failed")
+        except Exception as e:
+            logger.debug(f"Could not start persistent sudo shell: {e}")
+            if shell is not None:
+                shell.kill()
+                shell.wait()
+            return None
             
-        rc, _, stderr = self._sudo_cmd(["ip", "netns", "exec", self.namespace_name, "ip", "link", "set", self.veth_namespace, "up"])
-        if rc != 0:
-            logger.error(f"Failed to bring up namespace interface: {stderr}")
-            return False
+        # Drain stderr in the background so the shell never blocks on it
+        errors: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        threading.Thread(target=self._drain_stream, args=(shell.stderr, errors), daemon=True).start()
+        
+        self._sudo_shell = shell
+        self._sudo_shell_errors = errors
+        atexit.register(self._close_sudo_shell)
+        return shell
+
+    @staticmethod
+    def _drain_stream(stream, lines: "queue.Queue[Optional[bytes]]") -> None:
+        """Copy lines from a stream into a queue, ending with None at EOF"""
+        for line in iter(stream.readline, b""):
+            lines.put(line)
+        lines.put(None)
+
+    def _sudo_shell_cmd(self, shell: subprocess.Popen, cmd: List[str],
+                        env: Optional[Dict[str, str]] = None) -> Optional[Tuple[int, str, str]]:
+        """
+        Run a command in the persistent root shell.
+
+        The return code is recovered from a sentinel line printed after the
+        command; a matching sentinel on stderr delimits its error output.
+        Both sentinels are preceded by a newline so they start their own
+        line even when the command's output doesn't end in one.
+
+        Args:
+            shell: Shell returned by _ensure_sudo_shell
+            cmd: Command to run as a list of strings
+            env: Optional extra environment variables for the command
+
+        Returns:
+            Tuple of (return_code, stdout, stderr), or None if the shell had
+            already died and the command was not sent
             
-        rc, _, stderr = self._sudo_cmd(["ip", "netns", "exec", self.namespace_name, "ip", "link", "set", "lo", "up"])
-        if rc != 0:
-            logger.error(f"Failed to bring up namespace loopback: {stderr}")
-            return False
+        Raises:
+            subprocess.TimeoutExpired: If the stderr sentinel never arrives;
+                the shell is killed so later commands start a fresh one
+        """
+        self._sudo_shell_seq += 1
+        marker = f"{_SHELL_DONE}:{self._sudo_shell_seq}"
+        # Extra variables become prefix assignments scoped to the command
+        assignments = "".join(f"{key}={shlex.quote(value)} " for key, value in (env or {}).items())
+        line = (f"{{ {assignments}{shlex.join(cmd)}; }} </dev/null; rc=$?; "
+                f"printf '\\n%s\\n' {marker} >&2; printf '\\n{marker}:%d\\n' $rc\n")
+        
+        try:
+            shell.stdin.write(line.encode())
+            shell.stdin.flush()
+        except OSError as e:
+            logger.debug(f"Persistent sudo shell is gone: {e}")
+            self._sudo_shell = None
+            return None
             
-        # Setup NAT for internet access
-        rc, _, stderr = self._sudo_cmd(["iptables", "-t", "nat", "-A", "POSTROUTING", "-s", self.network_cidr, "-j", "MASQUERADE"])
-        if rc != 0:
-            logger.error(f"Failed to setup NAT: {stderr}")
-            return False
+        # Lines stay bytes until the command is done, then decode once
+        done = f"{marker}:".encode()
+        rc, stdout = 1, []
+        for raw in iter(shell.stdout.readline, b""):
+            if raw.startswith(done):
+                rc = int(raw[len(done):])
+                break
+            stdout.append(raw)
+        else:
+            return 1, b"".join(stdout).decode("utf-8", "replace"), "sudo shell exited unexpectedly"
             
-        rc, _, stderr = self._sudo_cmd(["ip", "netns", "exec", self.namespace_name, "ip", "route", "add", "default", "via", self.host_ip])
-        if rc != 0:
-            logger.error(f"Failed to add default route: {stderr}")
+        sentinel = marker.encode()
+        stderr = []
+        while True:
+            try:
+                raw = self._sudo_shell_errors.get(timeout=_SHELL_STDERR_TIMEOUT)
+            except queue.Empty:
+                # The shell is out of step with us; don't let it hang later calls
+                logger.error(f"Persistent sudo shell lost track of: {shlex.join(cmd)}")
+                self._sudo_shell = None
+                shell.kill()
+                shell.wait()
+                raise subprocess.TimeoutExpired(cmd, _SHELL_STDERR_TIMEOUT)
+            if raw is None:
+                break
+            line = raw.rstrip(b"\n")
+            if line.endswith(sentinel):
+                stderr.append(line[:-len(sentinel)])
+                break
+            stderr.append(raw)
+            
+        # Drop the newlines printed ahead of the sentinels
+        output = b"".join(stdout)
+        if output.endswith(b"\n"):
+            output = output[:-1]
+        errors = b"".join(stderr)
+        if errors.endswith(b"\n"):
+            errors = errors[:-1]
+        return rc, output.decode("utf-8", "replace"), errors.decode("utf-8", "replace")
+
+    def _close_sudo_shell(self) -> None:
+        """Terminate the persistent root shell if it is running"""
+        atexit.unregister(self._close_sudo_shell)
+        with self._sudo_shell_lock:
+            shell, self._sudo_shell = self._sudo_shell, None
+        if shell is None or shell.poll() is not None:
+            return
+            
+        try:
+            shell.stdin.write(b"exit\n")
+            shell.stdin.close()
+            shell.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            shell.kill()
+            shell.wait()
+
+    def _release_sudo(self) -> None:
+        """Stop the persistent root shell and the sudo ticket refresh"""
+        self._close_sudo_shell()
+        self._cancel_sudo_refresh()
+
+    def __del__(self):
+        """Zero our copy of the sudo password when the object is collected"""
+        self._shred_password()
+
+    def __enter__(self) -> "NetworkIsolation":
+        """Use the instance as a context manager"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Release sudo resources; the network itself is left to cleanup()"""
+        self._release_sudo()
+
+    def _sudo_script(self, script: str, stop_on_error: bool = True) -> Tuple[int, str, str]:
+        """
+        Run a shell script with sudo privileges in a single invocation.
+
+        Args:
+            script: Shell script to run
+            stop_on_error: Abort the script at the first failing command
+
+        Returns:
+            Tuple of (return_code, stdout, stderr)
+        """
+        return self._sudo_cmd(["sh", "-ec" if stop_on_error else "-c", script])
+
+    def _run_sudo_steps(self, steps: List[Tuple[str, str]]) -> bool:
+        """
+        Run a chain of dependent privileged steps as one sudo script.
+
+        Each step is preceded by a ``STEP:n`` marker on stderr so a failure
+        can be mapped back to the step that caused it.
+
+        Args:
+            steps: List of (description, shell command) pairs
+
+        Returns:
+            bool: True if every step succeeded, False otherwise
+        """
+        rc, _, stderr = self._sudo_script(self._steps_script(steps))
+        if rc == 0:
+            return True
+        self._report_failed_step(steps, stderr)
+        return False
+
+    async def _run_sudo_steps_async(self, steps: List[Tuple[str, str]]) -> bool:
+        """
+        Run a chain of dependent privileged steps without blocking the event loop.
+
+        Args:
+            steps: List of (description, shell command) pairs
+
+        Returns:
+            bool: True if every step succeeded, False otherwise
+        """
+        rc, _, stderr = await self._sudo_cmd_async(["sh", "-ec", self._steps_script(steps)])
+        if rc == 0:
+            return True
+        self._report_failed_step(steps, stderr)
+        return False
+
+    @staticmethod
+    def _steps_script(steps: List[Tuple[str, str]]) -> str:
+        """Join steps into one script, announcing each with a STEP marker"""
+        return "\n".join(
+            f"echo STEP:{index} >&2\n{command}" for index, (_, command) in enumerate(steps)
+        )
+
+    @staticmethod
+    def _report_failed_step(steps: List[Tuple[str, str]], stderr: str) -> None:
+        """
+        Log which step of a failed steps script went wrong.
+
+        Args:
+            steps: Steps passed to the script
+            stderr: Error output of the script
+        """
+        failed, detail = 0, stderr
+        marker = stderr.rfind("STEP:")
+        if marker != -1:
+            number, _, detail = stderr[marker + len("STEP:"):].partition("\n")
+            if number.isdigit() and int(number) < len(steps):
+                failed = int(number)
+        logger.error(f"Failed to {steps[failed][0]}: {detail.strip()}")
+
+    def setup(self) -> bool:
+        """
+        Set up network isolation.
+
+        Returns:
+            bool: True if setup was successful, False otherwise
+        """
+        log_status("Setting up network isolation...", Colors.YELLOW)
+        
+        # Fail once up front rather than on every privileged step
+        if not (self._is_root or self._sudo_primed or self.sudo_password):
+            log_status("Network isolation requires root or a sudo password", Colors.RED)
             return False
             
-        # Enable IP forwarding
-        rc, _, stderr = self._sudo_cmd(["sh", "-c", f"echo 1 > /proc/sys/net/ipv4/ip_forward"])
-        if rc != 0:
-            logger.error(f"Failed to enable IP forwarding: {stderr}")
+        return self._setup_fn()
+
+    @staticmethod
+    def _in_event_loop() -> bool:
+        """Check whether the caller is already running inside an asyncio loop"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    def _setup_unsupported(self) -> bool:
+        """Report that network isolation is unavailable on this platform"""
+        log_status("Network isolation is only supported on Linux and macOS", Colors.RED)
+        return False
+
+    def _setup_linux(self) -> bool:
+        """
+        Set up network isolation on Linux using network namespaces.
+
+        Returns:
+            bool: True if setup was successful, False otherwise
+        """
+        # Talk to the kernel directly over netlink when we can, otherwise
+        # fall back to driving the ip/iptables binaries through sudo
+        if IPRoute is not None and self._is_root:
+            configured = self._setup_linux_netlink()
+        else:
+            if not self._in_event_loop():
+                configured = asyncio.run(self._setup_linux_async())
+            else:
+                # Already inside an event loop, so run the steps serially
+                configured = self._run_sudo_steps(self._linux_setup_steps())
+        if not configured:
             return False
             
         # Store network namespace info
@@ -199,6 +788,189 @@ class NetworkIsolation:
         log_status("Network isolation configured successfully", Colors.GREEN)
         return True
 
+    async def _setup_linux_async(self) -> bool:
+        """
+        Run the Linux setup steps, overlapping the independent ones.
+
+        The link steps form a chain, while the NAT rule and IP forwarding
+        do not depend on them or on each other.
+
+        Returns:
+            bool: True if every step succeeded, False otherwise
+        """
+        results = await asyncio.gather(
+            self._run_sudo_steps_async(self._linux_link_steps()),
+            *(self._run_sudo_steps_async([step]) for step in self._linux_routing_steps())
+        )
+        return all(results)
+
+    def _linux_setup_steps(self) -> List[Tuple[str, str]]:
+        """
+        Build the shell steps that set up network isolation on Linux.
+
+        Link configuration is fed to one ``ip -batch`` per namespace and the
+        NAT rule to a single ``iptables-restore``, so the whole setup costs
+        a handful of processes instead of one per command.
+
+        Returns:
+            List of (description, shell command) pairs
+        """
+        return self._linux_link_steps() + self._linux_routing_steps()
+
+    def _linux_link_steps(self) -> List[Tuple[str, str]]:
+        """
+        Build the dependent steps that create and address the veth pair.
+
+        Once the pair exists, bringing up the host end and configuring the
+        namespace end don't depend on each other, so they run as background
+        jobs and the step waits for both.
+
+        Returns:
+            List of (description, shell command) pairs
+        """
+        namespace_batch = _heredoc([self._ip, "-n", self.namespace_name, "-batch", "-"], [
+            f"addr add {self._ns_cidr} dev {self.veth_namespace}",
+            f"link set {self.veth_namespace} up",
+            "link set lo up",
+            f"route replace default via {self.host_ip}",
+        ])
+        return [
+            ("configure host interfaces",
+             _heredoc([self._ip, "-batch", "-"], [
+                 f"netns add {self.namespace_name}",
+                 f"link add {self.veth_host} type veth peer name {self.veth_namespace}",
+                 f"link set {self.veth_namespace} netns {self.namespace_name}",
+                 f"addr add {self._host_cidr} dev {self.veth_host}",
+             ])),
+            ("bring up interfaces",
+             f"{shlex.join([self._ip, 'link', 'set', self.veth_host, 'up'])} & host_up=$!\n"
+             f"{{ {namespace_batch}\n}} & namespace_up=$!\n"
+             f"wait $host_up && wait $namespace_up"),
+        ]
+
+    def _linux_routing_steps(self) -> List[Tuple[str, str]]:
+        """
+        Build the independent steps that let the namespace reach the outside.
+
+        Returns:
+            List of (description, shell command) pairs
+        """
+        return [
+            ("setup NAT", self._nat_rule_command()),
+            ("enable IP forwarding",
+             "echo 1 > /proc/sys/net/ipv4/ip_forward"),
+        ]
+
+    def _nat_rule_command(self) -> str:
+        """
+        Build a shell command that adds the MASQUERADE rule unless present.
+
+        iptables -C only reads the table, so a repeated setup neither
+        duplicates the rule nor pays for another insert.
+
+        Returns:
+            Shell command
+        """
+        rule = ["POSTROUTING", "-s", self.network_cidr, "-j", "MASQUERADE"]
+        check = shlex.join([self._iptables, "-t", "nat", "-C", *rule])
+        add = _heredoc([self._iptables_restore, "-n"], ["*nat", f"-A {' '.join(rule)}", "COMMIT"])
+        return f"{check} 2>/dev/null || {add}"
+
+    def _setup_linux_netlink(self) -> bool:
+        """
+        Set up network isolation in-process using pyroute2.
+
+        Requires root (CAP_NET_ADMIN) and the optional pyroute2 package.
+
+        Returns:
+            bool: True if setup was successful, False otherwise
+        """
+        # NAT and IP forwarding don't depend on the namespace, so run them
+        # alongside the netlink chain instead of after it. NAT has no netlink
+        # equivalent here and still goes through iptables.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leaves = {
+                executor.submit(self._sudo_cmd, ["sh", "-c", self._nat_rule_command()]): "setup NAT",
+                executor.submit(self._write_sysctl, "net.ipv4.ip_forward", "1"): "enable IP forwarding",
+            }
+            configured = self._configure_links_netlink()
+            
+            for future in as_completed(leaves):
+                rc, _, stderr = future.result()
+                if rc != 0:
+                    logger.error(f"Failed to {leaves[future]}: {stderr}")
+                    configured = False
+                    
+        return configured
+
+    def _configure_links_netlink(self) -> bool:
+        """
+        Create the namespace and veth pair and configure them over netlink.
+
+        Returns:
+            bool: True if every step succeeded, False otherwise
+        """
+        step = "create network namespace"
+        try:
+            netns.create(self.namespace_name)
+            
+            with IPRoute() as ipr:
+                step = "create virtual interfaces"
+                ipr.link("add", ifname=self.veth_host, kind="veth", peer=self.veth_namespace)
+                host_index = ipr.link_lookup(ifname=self.veth_host)[0]
+                
+                step = "move interface to namespace"
+                ns_index = ipr.link_lookup(ifname=self.veth_namespace)[0]
+                ipr.link("set", index=ns_index, net_ns_fd=self.namespace_name)
+                
+                step = "configure host interface"
+                ipr.addr("add", index=host_index, address=self.host_ip, prefixlen=24)
+                
+                step = "bring up host interface"
+                ipr.link("set", index=host_index, state="up")
+                
+            with NetNS(self.namespace_name) as ns:
+                step = "configure namespace interface"
+                ns_index = ns.link_lookup(ifname=self.veth_namespace)[0]
+                ns.addr("add", index=ns_index, address=self.namespace_ip, prefixlen=24)
+                
+                step = "bring up namespace interface"
+                ns.link("set", index=ns_index, state="up")
+                
+                step = "bring up namespace loopback"
+                ns.link("set", index=ns.link_lookup(ifname="lo")[0], state="up")
+                
+                step = "add default route"
+                ns.route("replace", dst="default", gateway=self.host_ip)
+        except Exception as e:
+            logger.error(f"Failed to {step}: {e}")
+            return False
+            
+        return True
+
+    def _write_sysctl(self, key: str, value: str) -> Tuple[int, str, str]:
+        """
+        Set a kernel parameter, writing /proc/sys directly when permitted.
+
+        Only falls back to a single privileged ``sysctl -w`` exec (no shell)
+        when the direct write is refused.
+
+        Args:
+            key: Dotted sysctl name (e.g., "net.ipv4.ip_forward")
+            value: Value to write
+
+        Returns:
+            Tuple of (return_code, stdout, stderr)
+        """
+        try:
+            with open(f"/proc/sys/{key.replace('.', '/')}", "w") as f:
+                f.write(value)
+            return 0, "", ""
+        except PermissionError:
+            return self._sudo_cmd(["sysctl", "-w", f"{key}={value}"])
+        except OSError as e:
+            return 1, "", str(e)
+
     def _setup_macos(self) -> bool:
         """
         Set up network isolation on macOS using pf and dnctl.
@@ -210,35 +982,34 @@ class NetworkIsolation:
         # Instead of trying to configure utun interfaces which require special privileges,
         # we'll create a local loopback alias and use pf to restrict traffic
         
-        # Create a loopback alias
-        rc, _, stderr = self._sudo_cmd(["ifconfig", "lo0", "alias", self.tap_ip, "netmask", "255.255.255.0"])
-        if rc != 0:
-            logger.error(f"Failed to create loopback alias: {stderr}")
-            return False
-            
-        # Create a temporary pf.conf file
-        pf_conf_path = self.env_dir / "pf.conf"
-        with open(pf_conf_path, "w") as f:
-            f.write(f"# SafeSpace network isolation\n")
-            f.write(f"# Block all outgoing connections from our virtual environment\n")
-            f.write(f"block out quick from {self.tap_ip} to any\n")
-            f.write(f"# Allow connections to our loopback subnet\n")
-            f.write(f"pass out quick from {self.tap_ip} to {self.network_cidr}\n")
-            f.write(f"pass in quick from {self.network_cidr} to {self.tap_ip}\n")
-        
-        # Load the pf rules
-        rc, _, stderr = self._sudo_cmd(["pfctl", "-f", str(pf_conf_path)])
-        if rc != 0:
-            logger.error(f"Failed to load pf rules: {stderr}")
+        # The ruleset is fed to pfctl on stdin, so no file is written
+        pf_rules = [
+            "# SafeSpace network isolation",
+            "# Block all outgoing connections from our virtual environment",
+            f"block out quick from {self.tap_ip} to any",
+            "# Allow connections to our loopback subnet",
+            f"pass out quick from {self.tap_ip} to {self.network_cidr}",
+            f"pass in quick from {self.network_cidr} to {self.tap_ip}",
+        ]
+        
+        # Create the loopback alias, load the pf rules and enable pf in one go
+        steps = [
+            ("create loopback alias",
+             shlex.join([self._ifconfig, "lo0", "alias", self.tap_ip, "netmask", "255.255.255.0"])),
+            ("load pf rules",
+             _heredoc([self._pfctl, "-a", _PF_ANCHOR, "-f", "-"], pf_rules)),
+            # Only enable pf when it is off; a failure to enable is not fatal
+            ("enable pf",
+             f"{shlex.join([self._pfctl, '-si'])} | grep -q 'Status: Enabled' || "
+             f"{shlex.join([self._pfctl, '-e'])} || true"),
+        ]
+        if not self._run_sudo_steps(steps):
             return False
             
-        # Enable pf if not already enabled
-        self._sudo_cmd(["pfctl", "-e"])
-            
         # Store network configuration info
         self._update_env_file({
             "LOOPBACK_ALIAS": self.tap_ip,
-            "PF_CONF_PATH": str(pf_conf_path)
+            "PF_ANCHOR": _PF_ANCHOR
         })
             
         log_status("Network isolation on macOS configured successfully", Colors.GREEN)
@@ -252,13 +1023,13 @@ class NetworkIsolation:
             bool: True if cleanup was successful, False otherwise
         """
         log_status("Cleaning up network isolation...", Colors.YELLOW)
-        
-        if self.is_linux:
-            return self._cleanup_linux()
-        elif self.is_macos:
-            return self._cleanup_macos()
-        else:
-            return False
+        result = self._cleanup_fn()
+        self._release_sudo()
+        return result
+
+    def _cleanup_unsupported(self) -> bool:
+        """Nothing to clean up on unsupported platforms"""
+        return False
 
     def _cleanup_linux(self) -> bool:
         """
@@ -267,16 +1038,66 @@ class NetworkIsolation:
         Returns:
             bool: True if cleanup was successful, False otherwise
         """
-        # Remove NAT rule
-        self._sudo_cmd(["iptables", "-t", "nat", "-D", "POSTROUTING", "-s", self.network_cidr, "-j", "MASQUERADE"])
-        
-        # Remove virtual interfaces and namespace
-        self._sudo_cmd(["ip", "link", "delete", self.veth_host])
-        self._sudo_cmd(["ip", "netns", "delete", self.namespace_name])
+        # Remove NAT rule, virtual interfaces and namespace, ignoring failures
+        if IPRoute is not None and self._is_root:
+            self._cleanup_linux_netlink()
+        elif not self._in_event_loop():
+            asyncio.run(self._cleanup_linux_async())
+        else:
+            # Already inside an event loop, so remove everything in one script
+            self._sudo_script("\n".join(self._linux_cleanup_commands()), stop_on_error=False)
         
         log_status("Network isolation cleaned up", Colors.GREEN)
         return True
 
+    async def _cleanup_linux_async(self) -> None:
+        """Run the independent Linux teardown commands concurrently"""
+        await self._sudo_gather([["sh", "-c", command] for command in self._linux_cleanup_commands()])
+
+    def _linux_cleanup_commands(self) -> List[str]:
+        """
+        Build the shell commands that tear down network isolation on Linux.
+
+        The commands don't depend on each other: removing the namespace
+        takes the veth pair with it, and whichever runs second just fails.
+
+        Returns:
+            List of shell commands
+        """
+        return [
+            _heredoc([self._iptables_restore, "-n"], [
+                "*nat",
+                f"-D POSTROUTING -s {self.network_cidr} -j MASQUERADE",
+                "COMMIT",
+            ]),
+            shlex.join([self._ip, "link", "delete", self.veth_host]),
+            shlex.join([self._ip, "netns", "delete", self.namespace_name]),
+        ]
+
+    def _cleanup_linux_netlink(self) -> None:
+        """
+        Tear down network isolation in-process using pyroute2.
+
+        Each step is attempted even if an earlier one fails, since any of
+        the objects may already be gone.
+        """
+        rc, _, stderr = self._sudo_cmd([self._iptables, "-t", "nat", "-D", "POSTROUTING", "-s", self.network_cidr, "-j", "MASQUERADE"])
+        if rc != 0:
+            logger.debug(f"Could not remove NAT rule: {stderr}")
+            
+        # Deleting the host end of the veth pair removes its peer as well
+        try:
+            with IPRoute() as ipr:
+                for index in ipr.link_lookup(ifname=self.veth_host):
+                    ipr.link("del", index=index)
+        except Exception as e:
+            logger.debug(f"Could not remove virtual interfaces: {e}")
+            
+        try:
+            netns.remove(self.namespace_name)
+        except Exception as e:
+            logger.debug(f"Could not remove network namespace: {e}")
+
     def _cleanup_macos(self) -> bool:
         """
         Clean up network isolation on macOS.
@@ -284,21 +1105,18 @@ class NetworkIsolation:
         Returns:
             bool: True if cleanup was successful, False otherwise
         """
-        # Remove the loopback alias
-        self._sudo_cmd(["ifconfig", "lo0", "-alias", self.tap_ip])
-        
-        # Disable pf rules related to our network
-        pf_conf_path = self.env_dir / "pf.conf"
-        if pf_conf_path.exists():
-            # Create an empty ruleset for cleanup
-            with open(pf_conf_path, "w") as f:
-                f.write("# Empty ruleset for cleanup\n")
-                
-            # Load the empty ruleset
-            self._sudo_cmd(["pfctl", "-f", str(pf_conf_path)])
-            
-            # Remove the file
-            pf_conf_path.unlink()
+        # Remove the loopback alias and flush our anchors; the rest of the
+        # host's ruleset is untouched
+        commands = [
+            [self._ifconfig, "lo0", "-alias", self.tap_ip],
+            [self._pfctl, "-a", _PF_ANCHOR, "-F", "all"],
+            [self._pfctl, "-a", _PF_CONDITIONS_ANCHOR, "-F", "all"],
+        ]
+        if not self._in_event_loop():
+            asyncio.run(self._sudo_gather(commands))
+        else:
+            for command in commands:
+                self._sudo_cmd(command)
         
         log_status("Network isolation on macOS cleaned up", Colors.GREEN)
         return True
@@ -313,29 +1131,39 @@ class NetworkIsolation:
         Returns:
             Tuple of (return_code, stdout, stderr)
         """
-        if self.is_linux:
-            full_cmd = ["ip", "netns", "exec", self.namespace_name] + cmd
-            return self._sudo_cmd(full_cmd)
-        elif self.is_macos:
-            # On macOS, we use environment variables to direct network traffic
-            # to our loopback alias
-            env_cmd = [
-                "env",
-                f"SAFESPACE_IP={self.tap_ip}",
-                f"SAFESPACE_NETWORK={self.network_cidr}",
-                # Force standard utilities to use our loopback alias
-                "HOSTALIASES=" + str(self.env_dir / "hosts")
-            ] + cmd
-            
-            # Create HOSTALIASES file to redirect hostnames to our loopback
-            with open(self.env_dir / "hosts", "w") as f:
-                f.write(f"# SafeSpace hosts file\n")
-                f.write(f"localhost {self.tap_ip}\n")
-                
-            return self._sudo_cmd(env_cmd)
-        else:
-            logger.error("Running commands in network isolation is only supported on Linux and macOS")
-            return 1, "", "Not supported on this platform"
+        return self._run_command_fn(cmd)
+
+    def _run_command_linux(self, cmd: List[str]) -> Tuple[int, str, str]:
+        """Run a command inside the network namespace"""
+        full_cmd = [self._ip, "netns", "exec", self.namespace_name] + cmd
+        return self._sudo_cmd(full_cmd)
+
+    def _run_command_macos(self, cmd: List[str]) -> Tuple[int, str, str]:
+        """Run a command directed at the loopback alias"""
+        hosts_file = self.env_dir / "hosts"
+        
+        # Create HOSTALIASES file to redirect hostnames to our loopback;
+        # it is only rewritten when the loopback address changes
+        if self._hostaliases_ip != self.tap_ip:
+            _write_file_atomic(hosts_file, (
+                f"# SafeSpace hosts file\n"
+                f"localhost {self.tap_ip}\n"
+            ).encode())
+            self._hostaliases_ip = self.tap_ip
+            
+        # On macOS, we use environment variables to direct network traffic
+        # to our loopback alias
+        return self._sudo_cmd(cmd, env={
+            "SAFESPACE_IP": self.tap_ip,
+            "SAFESPACE_NETWORK": self.network_cidr,
+            # Force standard utilities to use our loopback alias
+            "HOSTALIASES": str(hosts_file)
+        })
+
+    def _run_command_unsupported(self, cmd: List[str]) -> Tuple[int, str, str]:
+        """Refuse to run commands on unsupported platforms"""
+        logger.error("Running commands in network isolation is only supported on Linux and macOS")
+        return 1, "", "Not supported on this platform"
 
     def _update_env_file(self, env_vars: Dict[str, str]) -> None:
         """
@@ -344,10 +1172,13 @@ class NetworkIsolation:
         Args:
             env_vars: Dictionary of environment variables to add
         """
+        payload = "".join(f"{key}={value}\n" for key, value in env_vars.items()).encode()
         try:
-            with open(self.env_file, "a") as f:
-                for key, value in env_vars.items():
-                    f.write(f"{key}={value}\n")
+            fd = os.open(self.env_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            try:
+                os.write(fd, payload)
+            finally:
+                os.close(fd)
         except Exception as e:
             logger.error(f"Failed to update environment file: {e}")
 
@@ -386,22 +1217,34 @@ class NetworkIsolation:
         if bandwidth is not None:
             self.bandwidth = bandwidth
             
+        # Re-submitting the active configuration is a no-op
+        conditions = (self.latency, self.jitter, self.packet_loss, self.packet_corruption,
+                      self.packet_reordering, self.bandwidth)
+        if self.current_conditions_active and conditions == self._applied_conditions:
+            logger.debug("Network conditions unchanged, nothing to apply")
+            return True
+            
         # Enable simulation
         self.simulate_conditions = True
         
         log_status(f"Setting up network condition simulation...", Colors.YELLOW)
         
-        # Clean up any existing conditions first
-        self.reset_network_conditions()
+        # Clean up any existing conditions first; nothing to undo otherwise
+        if self.current_conditions_active:
+            self.reset_network_conditions()
         
         if self.is_linux:
-            return self._setup_linux_network_conditions()
+            result = self._setup_linux_network_conditions()
         elif self.is_macos:
-            return self._setup_macos_network_conditions()
+            result = self._setup_macos_network_conditions()
         else:
             log_status("Network condition simulation is only supported on Linux and macOS", Colors.RED)
             return False
             
+        if result:
+            self._applied_conditions = conditions
+        return result
+            
     def _setup_linux_network_conditions(self) -> bool:
         """
         Set up network condition simulation on Linux using tc.
@@ -412,63 +1255,39 @@ class NetworkIsolation:
         # Determine which interface to apply conditions to
         target_interface = self.veth_namespace
         
-        # Create commands to set up network conditions
-        # First, add the qdisc (tc requires this before adding rules)
-        rc, _, stderr = self._sudo_cmd([
-            "ip", "netns", "exec", self.namespace_name, 
-            "tc", "qdisc", "add", "dev", target_interface, "root", "netem"
-        ])
-        
-        if rc != 0:
-            logger.error(f"Failed to set up tc qdisc: {stderr}")
-            return False
+        # Build the netem options based on what's enabled
+        netem_args = []
+        for keyword, build in _NETEM_SPEC:
+            args = build(self)
+            if args:
+                netem_args.append(keyword)
+                netem_args += args
             
-        # Now, apply conditions (build the command based on what's enabled)
-        conditions_cmd = ["ip", "netns", "exec", self.namespace_name, "tc", "qdisc", "change", 
-                          "dev", target_interface, "root", "netem"]
+        tc = [self._ip, "netns", "exec", self.namespace_name, "tc", "qdisc"]
+        steps: List[Tuple[str, List[str]]] = []
         
-        # Add latency and jitter if set
-        if self.latency:
-            conditions_cmd.extend(["delay", self.latency])
-            if self.jitter:
-                conditions_cmd.extend([self.jitter])
-                
-        # Add packet loss if set
-        if self.packet_loss > 0:
-            conditions_cmd.extend(["loss", f"{self.packet_loss}%"])
-            
-        # Add corruption if set
-        if self.packet_corruption > 0:
-            conditions_cmd.extend(["corrupt", f"{self.packet_corruption}%"])
-            
-        # Add reordering if set
-        if self.packet_reordering > 0:
-            conditions_cmd.extend(["reorder", f"{self.packet_reordering}%"])
-            
-        # Run the conditions command
-        rc, _, stderr = self._sudo_cmd(conditions_cmd)
-        if rc != 0:
-            logger.error(f"Failed to set up network conditions: {stderr}")
-            return False
+        # A bandwidth-only setup goes straight to tbf below
+        if netem_args or not self.bandwidth:
+            # First add the qdisc (tc requires this before adding rules),
+            # then apply the conditions
+            steps.append(("set up tc qdisc", tc + ["add", "dev", target_interface, "root", "netem"]))
+            steps.append(("set up network conditions",
+                          tc + ["change", "dev", target_interface, "root", "netem"] + netem_args))
             
         # If bandwidth is set, add a rate limit
         if self.bandwidth:
-            # We need to use tbf (token bucket filter) for bandwidth limiting
-            # First remove the existing qdisc
-            self._sudo_cmd([
-                "ip", "netns", "exec", self.namespace_name, 
-                "tc", "qdisc", "del", "dev", target_interface, "root"
-            ])
-            
-            # Add tbf with the specified bandwidth
-            rc, _, stderr = self._sudo_cmd([
-                "ip", "netns", "exec", self.namespace_name, 
-                "tc", "qdisc", "add", "dev", target_interface, "root", "tbf", 
-                "rate", self.bandwidth, "burst", "32kbit", "latency", "400ms"
-            ])
+            # We need to use tbf (token bucket filter) for bandwidth limiting;
+            # the netem qdisc has to go first if one was added
+            if netem_args:
+                steps.append(("remove netem qdisc", tc + ["del", "dev", target_interface, "root"]))
+            steps.append(("set up bandwidth limit",
+                          tc + ["add", "dev", target_interface, "root", "tbf",
+                                "rate", self.bandwidth, "burst", "32kbit", "latency", "400ms"]))
             
+        for label, cmd in steps:
+            rc, _, stderr = self._sudo_cmd(cmd)
             if rc != 0:
-                logger.error(f"Failed to set up bandwidth limit: {stderr}")
+                logger.error(f"Failed to {label}: {stderr}")
                 return False
         
         self.current_conditions_active = True
@@ -484,23 +1303,8 @@ class NetworkIsolation:
             bool: True if setup was successful, False otherwise
         """
         # macOS uses dummynet for traffic shaping
-        # First, check if dummynet is loaded
-        rc, stdout, _ = self._sudo_cmd(["kldstat", "-m", "dummynet"])
-        if "dummynet" not in stdout:
-            # Load dummynet module
-            rc, _, stderr = self._sudo_cmd(["kldload", "dummynet"])
-            if rc != 0:
-                logger.error(f"Failed to load dummynet module: {stderr}")
-                return False
-        
-        # Create a pipe for traffic shaping
-        rc, _, stderr = self._sudo_cmd(["dnctl", "pipe", "1", "config"])
-        if rc != 0:
-            logger.error(f"Failed to create dummynet pipe: {stderr}")
-            return False
-        
         # Configure pipe with network conditions
-        pipe_cmd = ["dnctl", "pipe", "1", "config"]
+        pipe_cmd = [self._dnctl, "pipe", "1", "config"]
         
         # Add bandwidth limit if set
         if self.bandwidth:
@@ -516,28 +1320,26 @@ class NetworkIsolation:
         if self.packet_loss > 0:
             pipe_cmd.extend(["plr", str(self.packet_loss / 100.0)])  # dummynet uses 0-1 range
         
-        # Run the pipe configuration command
-        rc, _, stderr = self._sudo_cmd(pipe_cmd)
-        if rc != 0:
-            logger.error(f"Failed to configure dummynet pipe: {stderr}")
-            return False
-        
-        # Create pf rule to direct traffic to the pipe
-        pf_rule = f"dummynet out from {self.tap_ip} to any pipe 1\ndummynet in from any to {self.tap_ip} pipe 1"
-        pf_file = self.env_dir / "pf_dummynet.conf"
+        # Create pf rule to direct traffic to the pipe. It gets its own
+        # anchor so loading it leaves the isolation rules in place.
+        pf_rules = [
+            f"dummynet out from {self.tap_ip} to any pipe 1",
+            f"dummynet in from any to {self.tap_ip} pipe 1",
+        ]
         
-        with open(pf_file, "w") as f:
-            f.write(pf_rule)
-        
-        # Load the pf rule
-        rc, _, stderr = self._sudo_cmd(["pfctl", "-f", str(pf_file)])
-        if rc != 0:
-            logger.error(f"Failed to load pf rules for dummynet: {stderr}")
+        # Load dummynet, configure the pipe and load the pf rule in one go.
+        # Loading an already loaded module just fails, so it is not probed
+        # first; a failure to enable pf is not fatal.
+        steps = [
+            ("load dummynet module", f"{shlex.join([self._kldload, 'dummynet'])} 2>/dev/null || true"),
+            ("configure dummynet pipe", shlex.join(pipe_cmd)),
+            ("load pf rules for dummynet",
+             _heredoc([self._pfctl, "-a", _PF_CONDITIONS_ANCHOR, "-f", "-"], pf_rules)),
+            ("enable pf", f"{shlex.quote(self._pfctl)} -e 2>/dev/null || true"),
+        ]
+        if not self._run_sudo_steps(steps):
             return False
         
-        # Ensure pf is enabled
-        self._sudo_cmd(["pfctl", "-e"])
-        
         self.current_conditions_active = True
         log_status(f"Network conditions applied: latency={self.latency}, packet_loss={self.packet_loss}%, " +
                   f"bandwidth={self.bandwidth}", Colors.GREEN)
@@ -599,39 +1401,27 @@ class NetworkIsolation:
         log_status("Resetting network conditions...", Colors.YELLOW)
         
         if self.is_linux:
-            # Remove all tc qdiscs on the target interface
+            # Swap whatever root qdisc is installed for a default pfifo;
+            # replace works whether or not a qdisc exists
             rc, _, stderr = self._sudo_cmd([
-                "ip", "netns", "exec", self.namespace_name, 
-                "tc", "qdisc", "del", "dev", self.veth_namespace, "root"
+                self._ip, "netns", "exec", self.namespace_name, 
+                "tc", "qdisc", "replace", "dev", self.veth_namespace, "root", "pfifo"
             ])
             
-            # It's okay if it fails because there might not be any qdiscs
             if rc != 0:
-                logger.debug(f"No qdiscs to remove or error: {stderr}")
-                
-            # Add a default pfifo qdisc
-            self._sudo_cmd([
-                "ip", "netns", "exec", self.namespace_name, 
-                "tc", "qdisc", "add", "dev", self.veth_namespace, "root", "pfifo"
-            ])
+                logger.error(f"Failed to reset tc qdisc: {stderr}")
+                return False
             
         elif self.is_macos:
             # Delete the dummynet pipe
-            self._sudo_cmd(["dnctl", "pipe", "1", "delete"])
+            self._sudo_cmd([self._dnctl, "pipe", "1", "delete"])
             
-            # Remove pf rules for dummynet
-            pf_file = self.env_dir / "pf_dummynet.conf"
-            if pf_file.exists():
-                with open(pf_file, "w") as f:
-                    f.write("# Empty ruleset for cleanup\n")
-                    
-                # Load the empty ruleset
-                self._sudo_cmd(["pfctl", "-f", str(pf_file)])
-                
-                # Remove the file
-                pf_file.unlink()
+            # Remove the pf rules for dummynet by flushing their anchor;
+            # the host's own ruleset is left alone
+            self._sudo_cmd([self._pfctl, "-a", _PF_CONDITIONS_ANCHOR, "-F", "all"])
         
         self.current_conditions_active = False
+        self._applied_conditions = None
         log_status("Network conditions reset to normal", Colors.GREEN)
         return True
         
@@ -10,20 +10,153 @@ import sys
 import json
 import logging
 import time
-import platform
-from dataclasses import dataclass, field
+import heapq
+import random
+import subprocess
+import functools
+from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import psutil
 
-from .settings import get_settings
-from .utils import log_status, Colors, format_size
+from .utils import format_size
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# CPU topology doesn't change at runtime, so query it once
+_LOGICAL_CPUS = psutil.cpu_count(logical=True) or 1
+_PHYSICAL_CPUS = psutil.cpu_count(logical=False) or _LOGICAL_CPUS
+_ALL_CPUS = tuple(range(_LOGICAL_CPUS))
+
+_SYS_CPU_DIR = "/sys/devices/system/cpu"
+
+def _parse_cpu_list(cpu_list: str) -> Tuple[int, ...]:
+    """Parse a kernel CPU list such as "0-3,8,10-11" into CPU IDs"""
+    cpus: List[int] = []
+    for part in cpu_list.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return tuple(cpus)
+
+def _read_sysfs(path: str) -> Optional[str]:
+    """Read a small sysfs file, returning None if it doesn't exist"""
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+@functools.lru_cache(maxsize=None)
+def _detect_pe_topology() -> Optional[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+    """
+    Detect performance (P) and efficiency (E) cores on hybrid CPUs.
+    
+    On Linux this uses the Intel hybrid PMU CPU lists, or per-CPU
+    cpu_capacity (highest capacity = P-core). On macOS it asks sysctl
+    for the per-level logical CPU counts; affinity can't be set there,
+    so only the counts matter.
+    
+    Returns:
+        (P-core IDs, E-core IDs), or None if the CPU isn't hybrid or the
+        topology isn't exposed
+    """
+    if sys.platform == "darwin":
+        try:
+            result = subprocess.run(
+                ["sysctl", "-n", "hw.perflevel0.logicalcpu", "hw.perflevel1.logicalcpu"],
+                capture_output=True, text=True, check=True
+            )
+            perf_count, eff_count = (int(value) for value in result.stdout.split())
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            return None
+        return tuple(range(perf_count)), tuple(range(perf_count, perf_count + eff_count))
+    
+    # Intel hybrid CPUs register separate PMUs for P- and E-cores
+    core_cpus = _read_sysfs("/sys/devices/cpu_core/cpus")
+    atom_cpus = _read_sysfs("/sys/devices/cpu_atom/cpus")
+    if core_cpus and atom_cpus:
+        try:
+            return _parse_cpu_list(core_cpus), _parse_cpu_list(atom_cpus)
+        except ValueError:
+            pass
+    
+    # Otherwise group CPUs by their relative capacity
+    capacities: Dict[int, int] = {}
+    for cpu in _ALL_CPUS:
+        capacity = _read_sysfs(f"{_SYS_CPU_DIR}/cpu{cpu}/cpu_capacity")
+        if capacity is None:
+            return None
+        try:
+            capacities[cpu] = int(capacity)
+        except ValueError:
+            return None
+    
+    max_capacity = max(capacities.values(), default=0)
+    perf_cpus = tuple(cpu for cpu, capacity in capacities.items() if capacity == max_capacity)
+    eff_cpus = tuple(cpu for cpu, capacity in capacities.items() if capacity < max_capacity)
+    if not perf_cpus or not eff_cpus:
+        return None
+    return perf_cpus, eff_cpus
+
+# Disk read/write operation count treated as full disk I/O load.
+# This is a rough approximation.
+_DISK_IO_HIGH_OPS = 10000.0
+
+# Above this many cache files, eviction samples candidates at random
+# instead of selecting the exact oldest files
+_APPROX_EVICTION_THRESHOLD = 10_000
+_EVICTION_SAMPLE_SIZE = 64
+
+def _walk_cache(
+    root: str,
+    dir_mtimes: Optional[List[Tuple[str, int]]] = None,
+    skip_hidden_files: bool = False,
+) -> Iterator[Tuple[str, int, float]]:
+    """
+    Walk a cache directory, yielding (path, size, mtime) for every file.
+
+    Uses os.scandir so each file costs a single stat call. Hidden
+    subdirectories (.git, .cache, ...) are not descended into.
+
+    Args:
+        root: Directory to walk
+        dir_mtimes: If given, (path, st_mtime_ns) is appended for every
+            directory walked, taken before it is listed
+        skip_hidden_files: Also skip files whose names start with a dot
+    """
+    try:
+        if dir_mtimes is not None:
+            dir_mtimes.append((root, os.stat(root).st_mtime_ns))
+        entries = os.scandir(root)
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith('.'):
+                        yield from _walk_cache(entry.path, dir_mtimes, skip_hidden_files)
+                elif skip_hidden_files and entry.name.startswith('.'):
+                    continue
+                elif entry.is_file():
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
+            except OSError:
+                # The entry vanished or can't be read; skip it
+                continue
+
+def _dir_mtimes_unchanged(dir_mtimes: Tuple[Tuple[str, int], ...]) -> bool:
+    """Check that every recorded directory still has the same mtime"""
+    try:
+        return all(os.stat(path).st_mtime_ns == mtime for path, mtime in dir_mtimes)
+    except OSError:
+        return False
+
 class CoreType(Enum):
     """Types of CPU cores for resource allocation"""
     PERFORMANCE = "performance"
@@ -35,6 +168,22 @@ class WorkloadType(Enum):
     MEDIUM = "medium"
     HEAVY = "heavy"
 
+# Nice value for commands by (workload type, core type); lower priority
+# under load, especially on efficiency cores. Missing pairs mean 0.
+_NICE_TABLE = {
+    (WorkloadType.HEAVY, CoreType.EFFICIENCY): 15,
+    (WorkloadType.HEAVY, CoreType.PERFORMANCE): 5,
+    (WorkloadType.MEDIUM, CoreType.EFFICIENCY): 10,
+}
+
+# (memory fraction, CPU fraction) of available resources to recommend
+# for each workload type
+_LIMIT_FRACTIONS = {
+    WorkloadType.LIGHT: (0.7, 0.7),   # Can use more resources when load is light
+    WorkloadType.MEDIUM: (0.5, 0.5),  # Moderate resource usage
+    WorkloadType.HEAVY: (0.3, 0.3),   # Conservative resource usage
+}
+
 @dataclass
 class ResourceConfig:
     """Configuration for resource management"""
@@ -47,14 +196,19 @@ class ResourceConfig:
     def from_system(cls, cache_dir: Path) -> "ResourceConfig":
         """Create a resource configuration based on system capabilities"""
         # Get total CPU count
-        total_cpus = psutil.cpu_count(logical=True)
-        physical_cpus = psutil.cpu_count(logical=False)
+        total_cpus = _LOGICAL_CPUS
+        physical_cpus = _PHYSICAL_CPUS
+        topology = _detect_pe_topology()
         
         # Determine performance vs efficiency cores
-        # On modern CPUs, we can assume about half are performance cores
+        if topology is not None:
+            # Hybrid CPU with a known P/E split
+            performance_cores = len(topology[0])
+            efficiency_cores = len(topology[1])
+        # Otherwise we can assume about half are performance cores
         # and half are efficiency cores if there's a difference between
         # logical and physical
-        if total_cpus > physical_cpus:
+        elif total_cpus > physical_cpus:
             performance_cores = max(1, physical_cpus // 2)
             efficiency_cores = max(1, physical_cpus - performance_cores)
         else:
@@ -85,8 +239,14 @@ class ResourceConfig:
     def save(self, config_file: Path) -> None:
         """Save the configuration to a file"""
         config_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(config_file, "w") as f:
-            json.dump(self.to_dict(), f, indent=2)
+        # Write a temp file and swap it into place, so a crash mid-write
+        # never leaves a truncated config that load() would reject
+        tmp_file = config_file.with_suffix(config_file.suffix + ".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, config_file)
     
     @classmethod
     def load(cls, config_file: Path) -> Optional["ResourceConfig"]:
@@ -111,6 +271,10 @@ class ResourceConfig:
 class ResourceManager:
     """Manages system resources for SafeSpace"""
     
+    # artifact_cache entry points, resolved on the first cleanup_cache call
+    _artifact_cache_mod: Optional[tuple] = None
+    _artifact_cache_available: Optional[bool] = None
+    
     def __init__(self, cache_dir: Path) -> None:
         """Initialize the resource manager"""
         self.cache_dir = cache_dir
@@ -124,16 +288,51 @@ class ResourceManager:
         
         self.config = config
         
+        # Precompute the core sets for each core type
+        performance_cores = self.config.performance_cores
+        topology = _detect_pe_topology()
+        if topology is not None:
+            # Use the actual P- and E-core IDs on hybrid CPUs
+            self._cores_by_type = {
+                CoreType.PERFORMANCE: topology[0][:performance_cores],
+                CoreType.EFFICIENCY: topology[1][:self.config.efficiency_cores],
+            }
+        else:
+            self._cores_by_type = {
+                CoreType.PERFORMANCE: _ALL_CPUS[:performance_cores],
+                CoreType.EFFICIENCY: _ALL_CPUS[performance_cores:performance_cores + self.config.efficiency_cores],
+            }
+        # Use fewer cores when the system is under heavy load
+        self._heavy_cores_by_type = {
+            core_type: cores[:max(1, len(cores) // 2)]
+            for core_type, cores in self._cores_by_type.items()
+        }
+        
         # Initialize dynamic resource tracking
-        self.last_resource_check = 0
+        self.last_resource_check = 0  # time.monotonic_ns() of the last update
         self.resource_check_interval = 5  # seconds
+        # Prime psutil's CPU counters so later non-blocking reads return
+        # the usage since the previous sample
+        psutil.cpu_percent(interval=None)
         self.current_load = self._get_system_load()
         self.current_workload_type = self._determine_workload_type()
+        
+        # Throttle cache sweeps, which walk the whole cache directory
+        self._last_cleanup_ts = float('-inf')
+        self._cleanup_interval = 60.0  # seconds
+        # Last measured cache size, valid while the directory mtimes it
+        # was measured against are unchanged
+        self._cache_size_cache: Tuple[Tuple[Tuple[str, int], ...], int] = ((), 0)
+        
+        # Disk usage is cached briefly; total memory never changes
+        self._disk_stats_cache: Tuple[float, Any] = (0.0, None)
+        self._disk_stats_ttl = 5.0  # seconds
+        self._total_memory = psutil.virtual_memory().total
     
     def _get_system_load(self) -> Dict[str, float]:
         """Get current system resource load"""
         # Get CPU and memory load
-        cpu_load = psutil.cpu_percent(interval=0.1) / 100.0
+        cpu_load = psutil.cpu_percent(interval=None) / 100.0
         memory_load = psutil.virtual_memory().percent / 100.0
         
         # Get disk I/O load - this is platform-dependent
@@ -142,16 +341,12 @@ class ResourceManager:
         try:
             # Different platforms have different disk I/O counter attributes
             # We'll try to get read/write counts as a generic measure
-            disk_counters = psutil.disk_io_counters(perdisk=True)
+            # Read/write operations across all disks, aggregated by psutil
+            disk_counters = psutil.disk_io_counters(perdisk=False)
             if disk_counters:
-                # Calculate total read/write operations across all disks
-                total_ops = sum(
-                    (getattr(disk, 'read_count', 0) + getattr(disk, 'write_count', 0))
-                    for disk in disk_counters.values()
-                )
-                # Normalize to a 0-1 scale (assuming 10,000 ops is high load)
-                # This is a rough approximation
-                disk_io_load = min(1.0, total_ops / 10000.0)
+                total_ops = disk_counters.read_count + disk_counters.write_count
+                # Normalize to a 0-1 scale
+                disk_io_load = min(1.0, total_ops / _DISK_IO_HIGH_OPS)
         except (AttributeError, ZeroDivisionError):
             # Fallback if disk counters aren't available
             disk_io_load = 0.0
@@ -176,9 +371,19 @@ class ResourceManager:
         else:
             return WorkloadType.LIGHT
     
+    @property
+    def resource_check_interval(self) -> float:
+        """Seconds between system load updates"""
+        return self._check_interval_ns / 1_000_000_000
+    
+    @resource_check_interval.setter
+    def resource_check_interval(self, seconds: float) -> None:
+        # Kept in integer nanoseconds for update_resource_status
+        self._check_interval_ns = int(seconds * 1_000_000_000)
+    
     def update_resource_status(self) -> bool:
         """Update the resource status if needed and return True if updated"""
-        current_time = time.time()
+        current_time = time.monotonic_ns()
         
         # Always update on the first call
         if self.last_resource_check == 0:
@@ -192,7 +397,7 @@ class ResourceManager:
             return True
         
         # Check if we need to update based on the interval
-        if current_time - self.last_resource_check < self.resource_check_interval:
+        if current_time - self.last_resource_check < self._check_interval_ns:
             return False
         
         self.last_resource_check = current_time
@@ -209,14 +414,8 @@ class ResourceManager:
     
     def optimize_cores(self, core_type: CoreType) -> List[int]:
         """Get the CPU core IDs for the specified core type"""
-        all_cpus = list(range(psutil.cpu_count(logical=True)))
-        
-        if core_type == CoreType.PERFORMANCE:
-            # Use the first N cores for performance
-            return all_cpus[:self.config.performance_cores]
-        else:
-            # Use the remaining cores for efficiency
-            return all_cpus[self.config.performance_cores:self.config.performance_cores + self.config.efficiency_cores]
+        # Performance uses the first N cores, efficiency the ones after them
+        return list(self._cores_by_type[core_type])
     
     def run_optimized(self, command: str, core_type: CoreType) -> int:
         """Run a command optimized for the specified core type"""
@@ -224,31 +423,44 @@ class ResourceManager:
         self.update_resource_status()
         
         # Adjust priority based on workload
-        nice_value = 0
-        if self.current_workload_type == WorkloadType.HEAVY:
-            # Lower priority on heavy system load
-            nice_value = 15 if core_type == CoreType.EFFICIENCY else 5
-        elif self.current_workload_type == WorkloadType.MEDIUM:
-            nice_value = 10 if core_type == CoreType.EFFICIENCY else 0
-        
-        if sys.platform == "darwin":  # macOS
-            if nice_value > 0:
-                # Use nice for lower priority on macOS
-                command = f"nice -n {nice_value} {command}"
-            return os.system(command)
-        else:  # Linux
-            # Use taskset for CPU affinity on Linux
-            cores = self.optimize_cores(core_type)
-            # Dynamically adjust cores based on workload
+        nice_value = _NICE_TABLE.get((self.current_workload_type, core_type), 0)
+        
+        # Pin the command to the cores for this core type, dynamically
+        # adjusted based on workload, where the platform supports it
+        cores: Tuple[int, ...] = ()
+        if hasattr(os, "sched_setaffinity"):
             if self.current_workload_type == WorkloadType.HEAVY:
-                # Use fewer cores when system is under heavy load
-                cores = cores[:max(1, len(cores) // 2)]
-            
-            core_list = ",".join(map(str, cores))
-            if nice_value > 0:
-                return os.system(f"nice -n {nice_value} taskset -c {core_list} {command}")
+                cores = self._heavy_cores_by_type[core_type]
             else:
-                return os.system(f"taskset -c {core_list} {command}")
+                cores = self._cores_by_type[core_type]
+        
+        def apply_scheduling() -> None:
+            # Runs in the child before exec, so the command and anything it
+            # forks start out pinned and deprioritized. Failures are ignored
+            # so the command still runs, as it would without taskset/nice,
+            # and a core set the container won't allow still gets niced.
+            if cores:
+                try:
+                    os.sched_setaffinity(0, cores)
+                except OSError:
+                    pass
+            if nice_value > 0:
+                try:
+                    os.nice(nice_value)
+                except OSError:
+                    pass
+        
+        # Run through the shell, as os.system did, so pipes, redirects and
+        # variable expansion keep working
+        try:
+            result = subprocess.run(
+                ["/bin/sh", "-c", command],
+                preexec_fn=apply_scheduling if cores or nice_value > 0 else None
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.error(f"Failed to run command: {e}")
+            return 127
+        return result.returncode
     
     def get_recommended_resource_limits(self) -> Dict[str, Union[int, float]]:
         """Get recommended resource limits based on current system state"""
@@ -257,25 +469,16 @@ class ResourceManager:
         
         # Get total system resources
         total_memory = psutil.virtual_memory().total
-        total_cpus = psutil.cpu_count(logical=True)
+        total_cpus = _LOGICAL_CPUS
         
         # Calculate available resources
         available_memory = psutil.virtual_memory().available
-        available_cpu_percent = 100 - psutil.cpu_percent(interval=0.1)
+        available_cpu_percent = 100 - psutil.cpu_percent(interval=None)
         
         # Calculate recommended limits based on workload type
-        if self.current_workload_type == WorkloadType.LIGHT:
-            # Can use more resources when system load is light
-            memory_limit = int(available_memory * 0.7)  # 70% of available memory
-            cpu_limit = max(1, int(total_cpus * (available_cpu_percent / 100) * 0.7))
-        elif self.current_workload_type == WorkloadType.MEDIUM:
-            # Moderate resource usage
-            memory_limit = int(available_memory * 0.5)  # 50% of available memory
-            cpu_limit = max(1, int(total_cpus * (available_cpu_percent / 100) * 0.5))
-        else:  # HEAVY
-            # Conservative resource usage
-            memory_limit = int(available_memory * 0.3)  # 30% of available memory
-            cpu_limit = max(1, int(total_cpus * (available_cpu_percent / 100) * 0.3))
+        memory_fraction, cpu_fraction = _LIMIT_FRACTIONS[self.current_workload_type]
+        memory_limit = int(available_memory * memory_fraction)
+        cpu_limit = max(1, int(total_cpus * (available_cpu_percent / 100) * cpu_fraction))
         
         # Ensure minimum values
         memory_limit = max(memory_limit, 256 * 1024 * 1024)  # Minimum 256MB
@@ -287,108 +490,279 @@ class ResourceManager:
             "io_weight": 50 if self.current_workload_type == WorkloadType.HEAVY else 100,
         }
     
-    def cleanup_cache(self) -> None:
+    @classmethod
+    def _get_artifact_cache_api(cls) -> Optional[tuple]:
+        """
+        Resolve the artifact_cache entry points once per process.
+        
+        Returns:
+            (get_vm_image_cache, get_test_artifact_cache), or None if the
+            module is not available
+        """
+        if cls._artifact_cache_available is None:
+            try:
+                # Import artifact_cache here to avoid circular imports
+                from .artifact_cache import (
+                    get_vm_image_cache, 
+                    get_test_artifact_cache
+                )
+                cls._artifact_cache_mod = (get_vm_image_cache, get_test_artifact_cache)
+                cls._artifact_cache_available = True
+            except ImportError:
+                cls._artifact_cache_available = False
+        
+        return cls._artifact_cache_mod
+    
+    def cleanup_cache(self, force: bool = False) -> None:
         """
         Clean up cache directory based on cache_limit_bytes.
         
         This method removes old cache files to keep the cache size
         under the configured limit. It also uses the content-addressable 
-        cache system if available.
+        cache system if available. Calls within _cleanup_interval seconds
+        of the last sweep are skipped.
+        
+        Args:
+            force: Sweep even if the last cleanup was recent
+        """
+        for _ in self.cleanup_cache_iter(force=force):
+            pass
+    
+    def cleanup_cache_iter(self, force: bool = False, max_files_per_batch: int = 100) -> Iterator[int]:
         """
+        Clean up the cache directory incrementally.
+        
+        Works like cleanup_cache, but yields after each batch of work so
+        callers can bound the time spent per tick, or stop early by no
+        longer iterating.
+        
+        Args:
+            force: Sweep even if the last cleanup was recent
+            max_files_per_batch: Maximum number of files removed per batch
+            
+        Yields:
+            int: Bytes freed by each batch
+        """
+        if not force and time.monotonic() - self._last_cleanup_ts < self._cleanup_interval:
+            return
+        
         # Get resource status to ensure we have the latest metrics
         self.update_resource_status()
         
-        try:
-            # Import artifact_cache here to avoid circular imports
-            from .artifact_cache import (
-                get_vm_image_cache, 
-                get_test_artifact_cache
-            )
-            
-            # Check if the cache directory exists
-            if not self.config.cache_dir.exists():
-                return
+        artifact_cache_api = self._get_artifact_cache_api()
+        if artifact_cache_api is None:
+            # Fallback to traditional cleanup if artifact_cache module is not available
+            self._last_cleanup_ts = time.monotonic()
+            yield from self._traditional_cache_cleanup_iter(max_files_per_batch)
+            return
+        get_vm_image_cache, get_test_artifact_cache = artifact_cache_api
+        
+        # Check if the cache directory exists
+        if not self.config.cache_dir.exists():
+            return
+        
+        # Get the current cache size
+        cache_size = self._current_cache_size()
+        self._last_cleanup_ts = time.monotonic()
+        
+        # If we're under the limit, no cleanup needed
+        if cache_size <= self.config.cache_limit_bytes:
+            return
+        
+        # If content-addressable cache is available, use it for cleanup
+        vm_image_cache = get_vm_image_cache(self.config.cache_dir / "vm")
+        test_artifact_cache = get_test_artifact_cache(self.config.cache_dir / "test")
+        
+        # Calculate how much space we need to free up
+        bytes_to_free = cache_size - self.config.cache_limit_bytes
+        bytes_freed = 0
+        
+        # Clean up VM images if needed (prioritize VM image cleanup)
+        if bytes_freed < bytes_to_free:
+            # Clean VM image cache with appropriate limit
+            remaining_bytes_needed = bytes_to_free - bytes_freed
+            vm_cache_limit = max(0, self.config.cache_limit_bytes // 2)
+            vm_bytes_freed = vm_image_cache.cache.cleanup(vm_cache_limit)
+            bytes_freed += vm_bytes_freed
+            yield vm_bytes_freed
+        
+        # Clean up test artifacts if needed
+        if bytes_freed < bytes_to_free:
+            # Clean test artifact cache with appropriate limit
+            test_artifact_cache.cleanup_test_artifacts(max_age_days=7)
+            yield 0
+        
+        # Fallback to traditional cleanup if needed
+        if bytes_freed < bytes_to_free:
+            yield from self._traditional_cache_cleanup_iter(max_files_per_batch)
             
-            # Get the current cache size
-            cache_size = sum(
-                f.stat().st_size for f in self.config.cache_dir.glob('**/*')
-                if f.is_file()
-            )
+        logger.info(f"Cache cleaned up: freed {format_size(bytes_freed)}")
+    
+    def _current_cache_size(self) -> int:
+        """
+        Get the total size of the files in the cache directory.
+        
+        The size from the previous walk is reused as long as no directory
+        in the tree has a new mtime, i.e. no file was added, removed or
+        renamed since.
+        
+        Returns:
+            int: Cache size in bytes
+        """
+        dir_mtimes, cache_size = self._cache_size_cache
+        if dir_mtimes and _dir_mtimes_unchanged(dir_mtimes):
+            return cache_size
+        
+        walked_dirs: List[Tuple[str, int]] = []
+        cache_size = sum(
+            size for _, size, _ in _walk_cache(str(self.config.cache_dir), walked_dirs)
+        )
+        self._cache_size_cache = (tuple(walked_dirs), cache_size)
+        return cache_size
+    
+    def _traditional_cache_cleanup(self) -> None:
+        """Traditional cache cleanup method as fallback."""
+        for _ in self._traditional_cache_cleanup_iter():
+            pass
+    
+    def _traditional_cache_cleanup_iter(self, max_files_per_batch: int = 100) -> Iterator[int]:
+        """
+        Traditional cache cleanup, yielding the bytes freed per batch.
+        
+        Args:
+            max_files_per_batch: Maximum number of files removed per batch
             
-            # If we're under the limit, no cleanup needed
-            if cache_size <= self.config.cache_limit_bytes:
+        Yields:
+            int: Bytes freed by each batch
+        """
+        try:
+            # Check if the cache directory exists
+            cache_dir = str(self.config.cache_dir)
+            if not os.path.isdir(cache_dir):
                 return
             
-            # If content-addressable cache is available, use it for cleanup
-            vm_image_cache = get_vm_image_cache(self.config.cache_dir / "vm")
-            test_artifact_cache = get_test_artifact_cache(self.config.cache_dir / "test")
+            # Get all non-hidden files in the cache directory as
+            # (path, size, mtime), from a single stat per file
+            cache_files = list(_walk_cache(cache_dir, skip_hidden_files=True))
             
-            # Calculate how much space we need to free up
-            bytes_to_free = cache_size - self.config.cache_limit_bytes
-            bytes_freed = 0
-            
-            # Clean up VM images if needed (prioritize VM image cleanup)
-            if bytes_freed < bytes_to_free:
-                # Clean VM image cache with appropriate limit
-                remaining_bytes_needed = bytes_to_free - bytes_freed
-                vm_cache_limit = max(0, self.config.cache_limit_bytes // 2)
-                vm_bytes_freed = vm_image_cache.cache.cleanup(vm_cache_limit)
-                bytes_freed += vm_bytes_freed
+            # Calculate total size
+            total_size = sum(size for _, size, _ in cache_files)
             
-            # Clean up test artifacts if needed
-            if bytes_freed < bytes_to_free:
-                # Clean test artifact cache with appropriate limit
-                test_artifact_cache.cleanup_test_artifacts(max_age_days=7)
+            batch_freed = 0
+            batch_files = 0
+            for file_size in self._evict_oldest(cache_files, total_size):
+                total_size -= file_size
+                batch_freed += file_size
+                batch_files += 1
+                if batch_files >= max_files_per_batch:
+                    yield batch_freed
+                    batch_freed = batch_files = 0
+            if batch_files:
+                yield batch_freed
             
-            # Fallback to traditional cleanup if needed
-            if bytes_freed < bytes_to_free:
-                self._traditional_cache_cleanup()
-                
-            logger.info(f"Cache cleaned up: freed {format_size(bytes_freed)}")
+            logger.info(f"Cache cleanup complete. New size: {format_size(total_size)}")
             
-        except ImportError:
-            # Fallback to traditional cleanup if artifact_cache module is not available
-            self._traditional_cache_cleanup()
+        except Exception as e:
+            logger.exception(f"Error cleaning up cache: {e}")
     
-    def _traditional_cache_cleanup(self) -> None:
-        """Traditional cache cleanup method as fallback."""
-        try:
-            # Check if the cache directory exists
-            if not self.config.cache_dir.exists():
-                return
-            
-            # Get all files in the cache directory with their modification time
-            cache_files = [
-                (f, f.stat().st_mtime) for f in self.config.cache_dir.glob('**/*')
-                if f.is_file() and not f.name.startswith('.')
-            ]
+    def _evict_oldest(self, cache_files: List[Tuple[str, int, float]], total_size: int) -> Iterator[int]:
+        """
+        Remove the oldest cache files until the cache is under its limit.
+        
+        Args:
+            cache_files: (path, size, mtime) entries for the cache
+            total_size: Combined size of cache_files
             
-            # Sort by modification time (oldest first)
-            cache_files.sort(key=lambda x: x[1])
+        Yields:
+            int: Size of each file removed
+        """
+        # Very large caches use approximate LRU to keep eviction cheap
+        if len(cache_files) > _APPROX_EVICTION_THRESHOLD:
+            for file_size in self._approximate_lru_evict(
+                cache_files, total_size - self.config.cache_limit_bytes
+            ):
+                total_size -= file_size
+                yield file_size
+        
+        # Remove the oldest files in batches until we're under the limit.
+        # Each batch only selects the files it needs instead of sorting
+        # the whole listing.
+        while total_size > self.config.cache_limit_bytes and cache_files:
+            bytes_to_free = total_size - self.config.cache_limit_bytes
+            batch_size = max(32, int(len(cache_files) * bytes_to_free / total_size * 1.5))
+            victims = heapq.nsmallest(batch_size, cache_files, key=lambda x: x[2])
             
-            # Calculate total size
-            total_size = sum(f.stat().st_size for f, _ in cache_files)
+            # Drop this batch from the candidates for the next round
+            seen = {file_path for file_path, _, _ in victims}
+            cache_files = [entry for entry in cache_files if entry[0] not in seen]
             
-            # Remove files until we're under the limit
-            for file_path, _ in cache_files:
+            for file_path, file_size, _ in victims:
                 if total_size <= self.config.cache_limit_bytes:
                     break
-                    
-                # Get file size before removing
-                file_size = file_path.stat().st_size
                 
-                # Remove the file
-                try:
-                    file_path.unlink()
+                if self._remove_cache_file(file_path):
                     total_size -= file_size
-                    logger.debug(f"Removed cache file: {file_path}")
-                except OSError as e:
-                    logger.warning(f"Failed to remove cache file {file_path}: {e}")
-                    
-            logger.info(f"Cache cleanup complete. New size: {format_size(total_size)}")
+                    yield file_size
+    
+    @staticmethod
+    def _remove_cache_file(file_path: str) -> bool:
+        """Remove a single cache file, returning True on success"""
+        try:
+            os.unlink(file_path)
+            logger.debug(f"Removed cache file: {file_path}")
+            return True
+        except OSError as e:
+            logger.warning(f"Failed to remove cache file {file_path}: {e}")
+            return False
+    
+    def _approximate_lru_evict(
+        self, cache_files: List[Tuple[str, int, float]], bytes_to_free: int
+    ) -> Iterator[int]:
+        """
+        Evict roughly the oldest cache files by random sampling.
+        
+        Each round samples up to _EVICTION_SAMPLE_SIZE files and removes the
+        oldest quarter of the sample, so no full sort of the listing is needed.
+        
+        Args:
+            cache_files: (path, size, mtime) entries; sampled entries are
+                removed from the list in place
+            bytes_to_free: Number of bytes to free
             
-        except Exception as e:
-            logger.exception(f"Error cleaning up cache: {e}")
+        Yields:
+            int: Size of each file removed
+        """
+        bytes_freed = 0
+        while bytes_freed < bytes_to_free and cache_files:
+            sample = random.sample(
+                range(len(cache_files)), min(_EVICTION_SAMPLE_SIZE, len(cache_files))
+            )
+            sample.sort(key=lambda index: cache_files[index][2])
+            victims = sample[:max(1, len(sample) // 4)]
+            
+            # Swap-remove from the highest index down so the remaining
+            # victim indexes stay valid
+            victim_entries = []
+            for index in sorted(victims, reverse=True):
+                victim_entries.append(cache_files[index])
+                cache_files[index] = cache_files[-1]
+                cache_files.pop()
+            
+            for file_path, file_size, _ in victim_entries:
+                if bytes_freed >= bytes_to_free:
+                    break
+                if self._remove_cache_file(file_path):
+                    bytes_freed += file_size
+                    yield file_size
+    
+    def _disk_usage(self) -> Any:
+        """Get disk usage for the cache directory, cached for _disk_stats_ttl seconds"""
+        timestamp, disk_stats = self._disk_stats_cache
+        now = time.monotonic()
+        if disk_stats is None or now - timestamp >= self._disk_stats_ttl:
+            disk_stats = psutil.disk_usage(str(self.config.cache_dir))
+            self._disk_stats_cache = (now, disk_stats)
+        return disk_stats
     
     def adaptive_cache_limit(self) -> int:
         """
@@ -398,7 +772,7 @@ class ResourceManager:
             int: Adjusted cache limit in bytes
         """
         # Get disk stats for the cache directory's disk
-        disk_stats = psutil.disk_usage(str(self.config.cache_dir))
+        disk_stats = self._disk_usage()
         
         # Base cache limit is 10% of total memory
         base_limit = self.config.cache_limit_bytes
@@ -411,8 +785,7 @@ class ResourceManager:
         
         # If disk has plenty of space, we can potentially use more cache
         # but never more than 20% of total memory
-        total_memory = psutil.virtual_memory().total
-        max_cache = int(total_memory * 0.2)
+        max_cache = int(self._total_memory * 0.2)
         
         # Only increase if disk is less than 70% full
         if disk_stats.percent < 70:
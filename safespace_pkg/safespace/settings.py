@@ -6,13 +6,16 @@ It provides functionality to load, save, and manage settings from the user's
 home directory.
 """
 
+import functools
+import hashlib
+import json
 import logging
 import os
-from dataclasses import dataclass, field, asdict
+import sys
+from dataclasses import dataclass, field, fields
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Union
+from typing import IO, Callable, Dict, List, Optional, Any, Tuple, Union, get_args, get_origin
 
-import yaml
 from .utils import log_status, Colors, create_secure_directory
 
 # Set up logging
@@ -22,7 +25,10 @@ logger = logging.getLogger(__name__)
 DEFAULT_SETTINGS_DIR = Path.home() / ".config" / "safespace"
 DEFAULT_SETTINGS_FILE = DEFAULT_SETTINGS_DIR / "config.yaml"
 
-@dataclass
+# Settings objects don't need a per-instance __dict__; slots need Python 3.10+
+_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_OPTIONS)
 class NetworkSettings:
     """Network isolation settings"""
     default_enabled: bool = False
@@ -39,7 +45,7 @@ class NetworkSettings:
     default_packet_reordering: float = 0.0  # Default packet reordering as percentage (0-100)
     default_bandwidth: str = "10mbit"  # Default bandwidth limit
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class VMSettings:
     """VM settings"""
     default_enabled: bool = False
@@ -51,7 +57,7 @@ class VMSettings:
     default_alpine_version: str = "3.19.1"
     vm_dir: Optional[str] = None  # Custom directory for VM images
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class ContainerSettings:
     """Container settings"""
     default_enabled: bool = False
@@ -64,7 +70,7 @@ class ContainerSettings:
     default_mount_workspace: bool = True
     prefer_podman: bool = False  # If both Docker and Podman are available, prefer Podman
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class TestingSettings:
     """Testing environment settings"""
     default_enabled: bool = False
@@ -73,7 +79,7 @@ class TestingSettings:
     setup_pre_commit: bool = True
     default_test_runner: str = "pytest"
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class EnhancedDevSettings:
     """Enhanced development environment settings"""
     default_enabled: bool = False
@@ -82,7 +88,7 @@ class EnhancedDevSettings:
     setup_dev_scripts: bool = True
     setup_pre_commit: bool = True
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class ResourceSettings:
     """Resource allocation settings"""
     performance_cores_percent: int = 50  # Percentage of cores to use for performance tasks
@@ -91,7 +97,7 @@ class ResourceSettings:
     log_retention_days: int = 7
     warn_disk_space_threshold_mb: int = 500  # Warn when less than this much space is available
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class GeneralSettings:
     """General settings"""
     sudo_password_timeout: int = 15  # Minutes to cache sudo password
@@ -100,7 +106,30 @@ class GeneralSettings:
     enable_colors: bool = True
     enable_detailed_output: bool = True
 
-@dataclass
+# Field names of each settings section, looked up once
+_FIELD_NAMES = {
+    cls: tuple(f.name for f in fields(cls))
+    for cls in (
+        GeneralSettings, NetworkSettings, VMSettings, ContainerSettings,
+        TestingSettings, EnhancedDevSettings, ResourceSettings,
+    )
+}
+
+def _shallow(section: Any) -> Dict[str, Any]:
+    """
+    Convert a settings section to a dictionary.
+    
+    Sections only hold primitives and lists of strings, so this avoids the
+    recursive copy done by asdict; lists are still copied so callers can't
+    mutate the section through the result.
+    """
+    result = {}
+    for name in _FIELD_NAMES[type(section)]:
+        value = getattr(section, name)
+        result[name] = list(value) if isinstance(value, list) else value
+    return result
+
+@dataclass(**_DATACLASS_OPTIONS)
 class SafeSpaceSettings:
     """SafeSpace main settings container"""
     general: GeneralSettings = field(default_factory=GeneralSettings)
@@ -114,13 +143,13 @@ class SafeSpaceSettings:
     def to_dict(self) -> Dict[str, Any]:
         """Convert settings to dictionary"""
         return {
-            "general": asdict(self.general),
-            "network": asdict(self.network),
-            "vm": asdict(self.vm),
-            "container": asdict(self.container),
-            "testing": asdict(self.testing),
-            "enhanced_dev": asdict(self.enhanced_dev),
-            "resources": asdict(self.resources),
+            "general": _shallow(self.general),
+            "network": _shallow(self.network),
+            "vm": _shallow(self.vm),
+            "container": _shallow(self.container),
+            "testing": _shallow(self.testing),
+            "enhanced_dev": _shallow(self.enhanced_dev),
+            "resources": _shallow(self.resources),
         }
     
     @classmethod
@@ -128,23 +157,221 @@ class SafeSpaceSettings:
         """Create settings from dictionary"""
         settings = cls()
         
-        if "general" in data:
-            settings.general = GeneralSettings(**data["general"])
-        if "network" in data:
-            settings.network = NetworkSettings(**data["network"])
-        if "vm" in data:
-            settings.vm = VMSettings(**data["vm"])
-        if "container" in data:
-            settings.container = ContainerSettings(**data["container"])
-        if "testing" in data:
-            settings.testing = TestingSettings(**data["testing"])
-        if "enhanced_dev" in data:
-            settings.enhanced_dev = EnhancedDevSettings(**data["enhanced_dev"])
-        if "resources" in data:
-            settings.resources = ResourceSettings(**data["resources"])
+        for section, (section_cls, _) in _SECTION_REGISTRY.items():
+            if section in data:
+                setattr(settings, section, section_cls(**data[section]))
         
         return settings
 
+# Section name -> (section class, valid setting names), in to_dict() order
+_SECTION_REGISTRY: Dict[str, Tuple[type, frozenset]] = {
+    section.name: (section.type, frozenset(_FIELD_NAMES[section.type]))
+    for section in fields(SafeSpaceSettings)
+}
+
+# Settings sections, in the order SafeSpaceSettings.to_dict() emits them
+_SECTIONS = tuple(_SECTION_REGISTRY)
+
+def _coerce_bool(value: Any) -> bool:
+    """Convert a setting value to bool, accepting yes/no style strings"""
+    if isinstance(value, str):
+        return value.lower() in ("true", "yes", "y", "1")
+    return bool(value)
+
+def _coerce_list(value: Any) -> List[str]:
+    """Convert a setting value to a list, splitting comma-separated strings"""
+    if isinstance(value, list):
+        return value
+    return [item.strip() for item in str(value).split(",") if item.strip()]
+
+def _coercer_for(field_type: Any) -> Callable[[Any], Any]:
+    """Get the function that converts user input to a field's declared type"""
+    if field_type in (int, float, str):
+        return field_type
+    if field_type is bool:
+        return _coerce_bool
+    
+    origin = get_origin(field_type)
+    if origin is list:
+        return _coerce_list
+    if origin is Union:
+        # Optional[X]: coerce to X
+        args = [arg for arg in get_args(field_type) if arg is not type(None)]
+        if len(args) == 1:
+            inner = _coercer_for(args[0])
+            return lambda value: None if value is None else inner(value)
+    
+    return lambda value: value
+
+# Value converters for each (section, setting), from the dataclass field types
+_COERCERS: Dict[Tuple[str, str], Callable[[Any], Any]] = {
+    (section, setting.name): _coercer_for(setting.type)
+    for section, (section_cls, _) in _SECTION_REGISTRY.items()
+    for setting in fields(section_cls)
+}
+
+@functools.lru_cache(maxsize=None)
+def _yaml_codecs() -> Tuple[Any, type, type]:
+    """
+    Import PyYAML on first use and pick its fastest safe loader and dumper.
+    
+    Returns:
+        Tuple of the yaml module and its safe Loader and Dumper classes,
+        libyaml-backed when PyYAML was built with it
+    """
+    import yaml
+    try:
+        from yaml import CSafeLoader as loader, CSafeDumper as dumper
+    except ImportError:
+        from yaml import SafeLoader as loader, SafeDumper as dumper
+    return yaml, loader, dumper
+
+def load_yaml(stream: Union[str, bytes, IO]) -> Any:
+    """
+    Parse YAML with PyYAML's safe loader, imported on first use.
+    
+    Args:
+        stream: YAML text or an open file
+        
+    Returns:
+        Any: Parsed document
+    """
+    yaml, safe_loader, _ = _yaml_codecs()
+    return yaml.load(stream, Loader=safe_loader)
+
+def dump_yaml(data: Any, stream: Optional[IO] = None, encoding: Optional[str] = None) -> Any:
+    """
+    Serialize data as YAML laid out like the settings file.
+    
+    Args:
+        data: Data to serialize
+        stream: Open file to write to (optional)
+        encoding: Produce bytes in this encoding instead of text (optional)
+        
+    Returns:
+        Any: The YAML document if no stream was given, otherwise None
+    """
+    yaml, _, safe_dumper = _yaml_codecs()
+    return yaml.dump(data, stream, Dumper=safe_dumper, default_flow_style=False,
+                     sort_keys=False, encoding=encoding)
+
+def _sidecar_path(settings_file: Path) -> Path:
+    """Get the path of the JSON copy kept next to a YAML settings file"""
+    return settings_file.with_suffix(settings_file.suffix + ".json")
+
+def _settings_digest(raw: bytes) -> str:
+    """Fingerprint the YAML text a JSON copy of the settings was made from"""
+    return hashlib.sha256(raw).hexdigest()
+
+def _write_sidecar(data: Dict[str, Any], settings_file: Path, digest: str) -> None:
+    """
+    Write the parsed settings as JSON so later loads can skip YAML parsing.
+    
+    The copy is written to a temporary file and swapped into place, so a
+    crash never leaves a truncated copy behind. Settings holding values JSON
+    can't represent, such as the dates YAML parses unquoted timestamps into,
+    get no copy and are parsed from the YAML every time.
+    
+    Args:
+        data: Parsed settings
+        settings_file: Path to the YAML settings file
+        digest: _settings_digest() of the YAML text data was parsed from
+    """
+    sidecar = _sidecar_path(settings_file)
+    tmp_file = sidecar.with_name(f"{sidecar.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_file, "w") as f:
+            json.dump({"digest": digest, "settings": data}, f)
+        os.replace(tmp_file, sidecar)
+    except (OSError, TypeError, ValueError) as e:
+        logger.debug(f"Could not write settings cache: {e}")
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+
+def _load_sidecar(settings_file: Path, digest: str) -> Optional[Dict[str, Any]]:
+    """
+    Load the JSON copy of the settings if it was made from the current YAML text.
+    
+    Args:
+        settings_file: Path to the YAML settings file
+        digest: _settings_digest() of the current YAML text
+        
+    Returns:
+        Optional[Dict[str, Any]]: Parsed settings, or None if the JSON copy
+        is missing, stale or unreadable
+    """
+    try:
+        with open(_sidecar_path(settings_file), "r") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if not isinstance(cached, dict) or cached.get("digest") != digest:
+        return None
+    data = cached.get("settings")
+    return data if isinstance(data, dict) else None
+
+def _read_raw(settings_file: Path) -> Optional[Dict[str, Any]]:
+    """
+    Read the settings file as a plain dict without building SafeSpaceSettings.
+    
+    A JSON copy of the parsed file is kept alongside it and used instead of
+    parsing the YAML whenever it was made from the file's current contents.
+    
+    Args:
+        settings_file: Path to the settings file
+        
+    Returns:
+        Optional[Dict[str, Any]]: Parsed settings, or None if the file is
+        missing, empty or unreadable
+    """
+    try:
+        raw = settings_file.read_bytes()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.error(f"Failed to load settings: {e}")
+        return None
+    
+    digest = _settings_digest(raw)
+    data = _load_sidecar(settings_file, digest)
+    if data is not None:
+        return data
+    
+    try:
+        data = load_yaml(raw)
+    except Exception as e:
+        logger.error(f"Failed to load settings: {e}")
+        return None
+    
+    if not isinstance(data, dict) or not data:
+        return None
+    
+    _write_sidecar(data, settings_file, digest)
+    return data
+
+def _write_raw(data: Dict[str, Any], settings_file: Path) -> bool:
+    """
+    Write a settings dict to the YAML file and refresh its JSON copy.
+    
+    Args:
+        data: Settings as nested section dicts
+        settings_file: Path to the settings file
+        
+    Returns:
+        bool: True if settings were saved successfully, False otherwise
+    """
+    try:
+        raw = dump_yaml(data, encoding="utf-8")
+        settings_file.write_bytes(raw)
+        _write_sidecar(data, settings_file, _settings_digest(raw))
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save settings: {e}")
+        return False
+
 def load_settings(settings_file: Path = DEFAULT_SETTINGS_FILE) -> SafeSpaceSettings:
     """
     Load settings from the config file.
@@ -155,16 +382,11 @@ def load_settings(settings_file: Path = DEFAULT_SETTINGS_FILE) -> SafeSpaceSetti
     Returns:
         SafeSpaceSettings: Loaded settings
     """
-    if not settings_file.exists():
+    data = _read_raw(settings_file)
+    if not data:
         return create_default_settings(settings_file)
     
     try:
-        with open(settings_file, "r") as f:
-            data = yaml.safe_load(f)
-        
-        if not data:
-            return create_default_settings(settings_file)
-            
         return SafeSpaceSettings.from_dict(data)
     except Exception as e:
         logger.error(f"Failed to load settings: {e}")
@@ -184,13 +406,7 @@ def save_settings(settings: SafeSpaceSettings, settings_file: Path = DEFAULT_SET
     # Create directory if it doesn't exist
     settings_file.parent.mkdir(parents=True, exist_ok=True)
     
-    try:
-        with open(settings_file, "w") as f:
-            yaml.dump(settings.to_dict(), f, default_flow_style=False, sort_keys=False)
-        return True
-    except Exception as e:
-        logger.error(f"Failed to save settings: {e}")
-        return False
+    return _write_raw(settings.to_dict(), settings_file)
 
 def create_default_settings(settings_file: Path = DEFAULT_SETTINGS_FILE) -> SafeSpaceSettings:
     """
@@ -226,49 +442,68 @@ def update_setting(settings_file: Path, section: str, setting: str, value: Any)
     Returns:
         bool: True if the setting was updated successfully, False otherwise
     """
-    # Load current settings
-    settings = load_settings(settings_file)
-    
-    # Get the section
-    if not hasattr(settings, section):
-        logger.error(f"Invalid section: {section}")
-        return False
+    return update_settings_bulk(settings_file, {(section, setting): value})
+
+def update_settings_bulk(settings_file: Path, changes: Dict[Tuple[str, str], Any]) -> bool:
+    """
+    Update several settings with a single read and write of the settings file.
     
-    section_obj = getattr(settings, section)
+    The file is patched as a plain dict rather than round-tripped through
+    SafeSpaceSettings. Nothing is written if any change is invalid.
     
-    # Update the setting
-    if not hasattr(section_obj, setting):
-        logger.error(f"Invalid setting: {setting}")
-        return False
-    
-    # Convert value to the correct type
-    current_value = getattr(section_obj, setting)
-    value_type = type(current_value)
+    Args:
+        settings_file: Path to the settings file
+        changes: New values keyed by (section, setting)
+        
+    Returns:
+        bool: True if the settings were updated successfully, False otherwise
+    """
+    coerced = {}
+    for (section, setting), value in changes.items():
+        entry = _SECTION_REGISTRY.get(section)
+        if entry is None:
+            logger.error(f"Invalid section: {section}")
+            return False
+        
+        _, valid_keys = entry
+        if setting not in valid_keys:
+            logger.error(f"Invalid setting: {setting}")
+            return False
+        
+        # Convert value to the correct type
+        try:
+            coerced[(section, setting)] = _COERCERS[(section, setting)](value)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Invalid value type for {setting}: {e}")
+            return False
     
-    try:
-        if value_type == bool:
-            if isinstance(value, str):
-                value = value.lower() in ("true", "yes", "y", "1")
-        else:
-            value = value_type(value)
-    except (ValueError, TypeError):
-        logger.error(f"Invalid value type for {setting}. Expected {value_type.__name__}.")
-        return False
+    data = _read_raw(settings_file)
+    if not data:
+        create_secure_directory(settings_file.parent)
+        data = SafeSpaceSettings().to_dict()
     
-    # Set the value
-    setattr(section_obj, setting, value)
+    for (section, setting), value in coerced.items():
+        section_data = data.get(section)
+        if not isinstance(section_data, dict):
+            section_data = data[section] = {}
+        section_data[setting] = value
     
-    # Save settings
-    return save_settings(settings, settings_file)
+    return _write_raw(data, settings_file)
+
+@functools.lru_cache(maxsize=None)
+def _default_settings() -> SafeSpaceSettings:
+    """Get a shared default settings instance; callers must not modify it"""
+    return SafeSpaceSettings()
 
 def get_sections() -> List[str]:
     """Get all available settings sections"""
-    settings = SafeSpaceSettings()
-    return [section for section in settings.to_dict().keys()]
+    return list(_SECTIONS)
 
 def get_settings_in_section(section: str) -> Dict[str, Any]:
     """
-    Get all settings in a specific section.
+    Get the default settings in a specific section.
+    
+    For the values currently in effect, use load_settings().<section>.
     
     Args:
         section: Section name
@@ -276,14 +511,40 @@ def get_settings_in_section(section: str) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: Dictionary of settings in the section
     """
-    settings = SafeSpaceSettings()
-    
-    if not hasattr(settings, section):
+    if section not in _SECTION_REGISTRY:
         logger.error(f"Invalid section: {section}")
         return {}
     
-    section_obj = getattr(settings, section)
-    return asdict(section_obj)
+    return _shallow(getattr(_default_settings(), section))
+
+def load_section(settings_file: Path, section: str) -> Dict[str, Any]:
+    """
+    Load the settings of a single section.
+    
+    Only the raw section dict is read; values missing from the file fall
+    back to their defaults.
+    
+    Args:
+        settings_file: Path to the settings file
+        section: Section name
+        
+    Returns:
+        Dict[str, Any]: Settings in the section, empty if the section
+        doesn't exist
+    """
+    section_settings = get_settings_in_section(section)
+    if not section_settings:
+        return section_settings
+    
+    _, valid_keys = _SECTION_REGISTRY[section]
+    data = _read_raw(settings_file) or {}
+    section_data = data.get(section)
+    if isinstance(section_data, dict):
+        section_settings.update(
+            (key, value) for key, value in section_data.items() if key in valid_keys
+        )
+    
+    return section_settings
 
 def reset_settings(settings_file: Path = DEFAULT_SETTINGS_FILE) -> bool:
     """
@@ -302,12 +563,14 @@ def reset_settings(settings_file: Path = DEFAULT_SETTINGS_FILE) -> bool:
     return save_settings(settings, settings_file)
 
 # Global settings instance
-_settings_instance = None
+_settings_instance: Optional[SafeSpaceSettings] = None
 
 def get_settings() -> SafeSpaceSettings:
     """
     Get the global settings instance.
     
+    The settings are loaded from the config file on the first call.
+    
     Returns:
         SafeSpaceSettings: Global settings instance
     """
@@ -327,4 +590,4 @@ def reload_settings() -> SafeSpaceSettings:
     """
     global _settings_instance
     _settings_instance = load_settings()
-    return _settings_instance 
\ No newline at end of file
+    return _settings_instance
@@ -11,17 +11,19 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 import click
-import yaml
 
 from .settings import (
     DEFAULT_SETTINGS_FILE,
     get_sections,
     get_settings,
     get_settings_in_section,
+    dump_yaml,
+    load_section,
     load_settings,
+    load_yaml,
     reset_settings,
     update_setting,
-    save_settings,
+    update_settings_bulk,
 )
 from .utils import Colors, log_status
 
@@ -63,16 +65,13 @@ def list_settings(ctx: click.Context, section: Optional[str] = None, as_json: bo
     """
     config_file = ctx.obj["config_file"]
     
-    # Load settings
-    settings = load_settings(config_file)
-    
     if section:
-        # List settings for specific section
-        if not hasattr(settings, section):
+        # List settings for specific section, reading only that section
+        if section not in get_sections():
             log_status(f"Invalid section: {section}", Colors.RED)
             return
         
-        section_settings = get_settings_in_section(section)
+        section_settings = load_section(config_file, section)
         
         if as_json:
             click.echo(json.dumps(section_settings, indent=2))
@@ -82,9 +81,8 @@ def list_settings(ctx: click.Context, section: Optional[str] = None, as_json: bo
                 click.echo(f"  {key}: {value}")
     else:
         # List all sections and their settings
-        settings_dict = settings.to_dict()
-        
         if as_json:
+            settings_dict = load_settings(config_file).to_dict()
             click.echo(json.dumps(settings_dict, indent=2))
         else:
             log_status("Available sections:", Colors.CYAN)
@@ -107,23 +105,21 @@ def get_setting(ctx: click.Context, section: str, setting: str) -> None:
     """
     config_file = ctx.obj["config_file"]
     
-    # Load settings
-    settings = load_settings(config_file)
-    
     # Check if section exists
-    if not hasattr(settings, section):
+    if section not in get_sections():
         log_status(f"Invalid section: {section}", Colors.RED)
         return
     
-    section_obj = getattr(settings, section)
+    # Load only the requested section
+    section_settings = load_section(config_file, section)
     
     # Check if setting exists
-    if not hasattr(section_obj, setting):
+    if setting not in section_settings:
         log_status(f"Invalid setting: {setting}", Colors.RED)
         return
     
     # Get the value
-    value = getattr(section_obj, setting)
+    value = section_settings[setting]
     
     # Display the value
     click.echo(f"{value}")
@@ -203,7 +199,7 @@ def import_settings(ctx: click.Context, import_file: str, yes: bool = False) ->
         with open(import_path, "r") as f:
             # Load based on file extension
             if import_path.suffix in (".yaml", ".yml"):
-                data = yaml.safe_load(f)
+                data = load_yaml(f)
             elif import_path.suffix == ".json":
                 data = json.load(f)
             else:
@@ -214,27 +210,26 @@ def import_settings(ctx: click.Context, import_file: str, yes: bool = False) ->
             log_status("Empty file", Colors.RED)
             return
             
-        # Load current settings
-        settings = load_settings(config_file)
+        sections = get_sections()
+        changes = {}
         
-        # Update all sections
+        # Collect all known settings
         for section, section_data in data.items():
-            if not hasattr(settings, section):
+            if section not in sections:
                 log_status(f"Skipping unknown section: {section}", Colors.YELLOW)
                 continue
             
-            section_obj = getattr(settings, section)
+            known_keys = get_settings_in_section(section)
             
             for key, value in section_data.items():
-                if not hasattr(section_obj, key):
+                if key not in known_keys:
                     log_status(f"Skipping unknown setting: {section}.{key}", Colors.YELLOW)
                     continue
                 
-                # Set the value
-                setattr(section_obj, key, value)
+                changes[(section, key)] = value
         
-        # Save settings
-        if save_settings(settings, config_file):
+        # Apply them with a single write
+        if update_settings_bulk(config_file, changes):
             log_status(f"Settings imported from {import_file}", Colors.GREEN)
         else:
             log_status(f"Failed to save settings", Colors.RED)
@@ -263,7 +258,7 @@ def export_settings(ctx: click.Context, export_file: str, format: str = "yaml")
     try:
         with open(export_path, "w") as f:
             if format == "yaml":
-                yaml.dump(settings_dict, f, default_flow_style=False, sort_keys=False)
+                dump_yaml(settings_dict, f)
             else:  # json
                 json.dump(settings_dict, f, indent=2)
         
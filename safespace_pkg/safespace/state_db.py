@@ -5,13 +5,21 @@ This module provides a lightweight SQLite database for storing and retrieving
 environment state across sessions, enabling long-running test environments.
 """
 
+import atexit
 import json
 import logging
 import os
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, see the "speedups" extra
+    orjson = None
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -19,6 +27,55 @@ logger = logging.getLogger(__name__)
 # Default database location in user home directory
 DEFAULT_DB_PATH = Path.home() / ".config" / "safespace" / "environments.db"
 
+def _dumps(obj: Any) -> str:
+    """
+    Serialize a state or metadata blob, with orjson when available.
+    
+    Always returns text, so every row stores TEXT whichever serializer
+    wrote it and SQLite's json functions keep working.
+    """
+    if orjson is not None:
+        # Stringify non-str keys the way json.dumps does
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj)
+
+
+def _loads(data: Union[str, bytes]) -> Any:
+    """Deserialize a state or metadata blob written by _dumps."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _iso_now() -> str:
+    """
+    Get the current UTC time as a naive ISO 8601 string.
+    
+    The naive form keeps it comparable with timestamps written by earlier
+    versions.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+
+
+# Number of pending last_accessed updates to collect before writing them
+_TOUCH_FLUSH_THRESHOLD = 32
+
+# Columns returned by get_environment
+_ENV_COLUMNS = "id, name, root_dir, created_at, last_accessed, state, metadata"
+
+# Insert a new environment, or update an existing one while keeping its
+# original created_at
+_UPSERT_ENVIRONMENT = '''
+INSERT INTO environments (id, name, root_dir, created_at, last_accessed, state, metadata)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    name = excluded.name,
+    root_dir = excluded.root_dir,
+    last_accessed = excluded.last_accessed,
+    state = excluded.state,
+    metadata = excluded.metadata
+'''
+
 
 class StateDatabase:
     """
@@ -30,6 +87,12 @@ class StateDatabase:
     - Listing available environments
     - Updating existing environment state
     - Deleting environment state
+    
+    The last_accessed updates made by get_environment() are batched in
+    memory. They are written once enough accumulate, before listing or
+    purging, and by close(), which shared instances from get_state_db()
+    also run at exit. Until then other processes see the previous access
+    times, and a crash loses them; nothing else is affected.
     """
     
     def __init__(self, db_path: Optional[Union[str, Path]] = None):
@@ -41,19 +104,71 @@ class StateDatabase:
         """
         self.db_path = Path(db_path) if db_path else DEFAULT_DB_PATH
         self._ensure_db_dir()
+        
+        # last_accessed updates from get_environment, by environment ID,
+        # written in batches by _flush_touches()
+        self._pending_touch: Dict[str, str] = {}
+        
+        # One connection for the lifetime of the object, in autocommit mode;
+        # multi-statement writes go through _transaction()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            str(self.db_path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row  # Enable dictionary access
+        self._conn.executescript(
+            "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA temp_store=MEMORY;"
+        )
         self._init_db()
     
+    def close(self) -> None:
+        """Write pending updates and close the database connection."""
+        conn = getattr(self, "_conn", None)
+        if conn is not None:
+            with self._lock:
+                try:
+                    self._flush_touches()
+                except sqlite3.Error as e:
+                    logger.error(f"Failed to update access times: {e}")
+                self._conn = None
+            conn.close()
+    
+    def __del__(self):
+        """Close the connection when the database object is collected."""
+        self.close()
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Cursor]:
+        """Run several statements atomically on the shared connection."""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+    
     def _ensure_db_dir(self) -> None:
         """Ensure the database directory exists."""
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
     
+    def _flush_touches(self) -> None:
+        """Write pending last_accessed updates; the caller must hold the lock."""
+        if not self._pending_touch:
+            return
+        
+        self._conn.executemany(
+            "UPDATE environments SET last_accessed = ? WHERE id = ?",
+            [(accessed, env_id) for env_id, accessed in self._pending_touch.items()]
+        )
+        self._pending_touch.clear()
+    
     def _init_db(self) -> None:
         """Initialize the database schema if it doesn't exist."""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
         # Create environments table
-        cursor.execute('''
+        self._conn.execute('''
         CREATE TABLE IF NOT EXISTS environments (
             id TEXT PRIMARY KEY,
             name TEXT,
@@ -64,8 +179,12 @@ class StateDatabase:
             metadata TEXT
         )
         ''')
-        conn.commit()
-        conn.close()
+        
+        # Index lookups by name and ordering/purging by last access
+        self._conn.executescript('''
+        CREATE INDEX IF NOT EXISTS idx_env_name ON environments(name);
+        CREATE INDEX IF NOT EXISTS idx_env_last_accessed ON environments(last_accessed);
+        ''')
     
     def save_environment(self, 
                          env_id: str, 
@@ -87,57 +206,75 @@ class StateDatabase:
             bool: True if the operation was successful, False otherwise
         """
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
+            current_time = _iso_now()
             
-            # Check if environment already exists
-            cursor.execute("SELECT id FROM environments WHERE id = ?", (env_id,))
-            exists = cursor.fetchone() is not None
-            
-            current_time = datetime.utcnow().isoformat()
-            
-            if exists:
-                # Update existing environment
-                cursor.execute('''
-                UPDATE environments
-                SET name = ?, root_dir = ?, last_accessed = ?, state = ?, metadata = ?
-                WHERE id = ?
-                ''', (
-                    name, 
-                    str(root_dir), 
-                    current_time, 
-                    json.dumps(state), 
-                    json.dumps(metadata or {}),
-                    env_id
-                ))
-            else:
-                # Insert new environment
-                cursor.execute('''
-                INSERT INTO environments (id, name, root_dir, created_at, last_accessed, state, metadata)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
+            with self._lock:
+                # This write sets a newer access time than any pending one
+                self._pending_touch.pop(env_id, None)
+                self._conn.execute(_UPSERT_ENVIRONMENT, (
                     env_id,
                     name,
                     str(root_dir),
                     current_time,
                     current_time,
-                    json.dumps(state),
-                    json.dumps(metadata or {})
+                    _dumps(state),
+                    _dumps(metadata or {})
                 ))
             
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             logger.error(f"Failed to save environment: {e}")
             return False
     
+    def save_environments(self,
+                          items: Iterable[Tuple[str, Optional[str], Path,
+                                                Dict[str, Any], Optional[Dict[str, Any]]]]) -> int:
+        """
+        Save several environments in a single transaction.
+        
+        Args:
+            items: (env_id, name, root_dir, state, metadata) tuples, as
+                taken by save_environment()
+            
+        Returns:
+            int: Number of environments saved; 0 if the batch failed, in
+            which case none of them are saved
+        """
+        current_time = _iso_now()
+        saved = 0
+        
+        def rows() -> Iterator[Tuple[Any, ...]]:
+            nonlocal saved
+            for env_id, name, root_dir, state, metadata in items:
+                self._pending_touch.pop(env_id, None)
+                saved += 1
+                yield (
+                    env_id,
+                    name,
+                    str(root_dir),
+                    current_time,
+                    current_time,
+                    _dumps(state),
+                    _dumps(metadata or {})
+                )
+        
+        try:
+            with self._transaction() as cursor:
+                cursor.executemany(_UPSERT_ENVIRONMENT, rows())
+            return saved
+        except Exception as e:
+            logger.error(f"Failed to save environments: {e}")
+            return 0
+    
     def get_environment(self, 
                         env_id: Optional[str] = None, 
                         name: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Get environment state from the database.
         
+        The access time this records is written in a batch; see the class
+        documentation.
+        
         Args:
             env_id: Environment ID (optional if name is provided)
             name: Environment name (optional if env_id is provided)
@@ -150,44 +287,63 @@ class StateDatabase:
             return None
             
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            conn.row_factory = sqlite3.Row  # Enable dictionary access
-            cursor = conn.cursor()
-            
-            if env_id:
-                cursor.execute("SELECT * FROM environments WHERE id = ?", (env_id,))
-            else:
-                cursor.execute("SELECT * FROM environments WHERE name = ?", (name,))
+            with self._lock:
+                cursor = self._conn.cursor()
                 
-            row = cursor.fetchone()
-            
-            if not row:
-                conn.close()
-                return None
+                if env_id:
+                    cursor.execute(f"SELECT {_ENV_COLUMNS} FROM environments WHERE id = ?", (env_id,))
+                else:
+                    cursor.execute(f"SELECT {_ENV_COLUMNS} FROM environments WHERE name = ?", (name,))
+                    
+                row = cursor.fetchone()
                 
-            # Update last accessed time
-            current_time = datetime.utcnow().isoformat()
-            cursor.execute('''
-            UPDATE environments
-            SET last_accessed = ?
-            WHERE id = ?
-            ''', (current_time, row['id']))
-            
-            conn.commit()
+                if not row:
+                    return None
+                    
+                # Record the access; these are written in batches
+                self._pending_touch[row['id']] = _iso_now()
+                if len(self._pending_touch) >= _TOUCH_FLUSH_THRESHOLD:
+                    self._flush_touches()
             
             # Convert row to dictionary
             env_data = dict(row)
             
             # Parse JSON fields
-            env_data['state'] = json.loads(env_data['state'])
-            env_data['metadata'] = json.loads(env_data['metadata'])
+            env_data['state'] = _loads(env_data['state'])
+            env_data['metadata'] = _loads(env_data['metadata'])
             
-            conn.close()
             return env_data
         except Exception as e:
             logger.error(f"Failed to get environment: {e}")
             return None
     
+    def iter_environments(self) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over all stored environments.
+        
+        The summary rows are fetched under the lock, which is released
+        before the first one is yielded, so a slow consumer doesn't block
+        other threads using the database. Each row is only turned into a
+        dict as it is consumed.
+        
+        Yields:
+            Dictionaries containing environment summary information
+        """
+        try:
+            with self._lock:
+                self._flush_touches()
+                rows = self._conn.execute('''
+                SELECT id, name, root_dir, created_at, last_accessed
+                FROM environments
+                ORDER BY last_accessed DESC
+                ''').fetchall()
+        except Exception as e:
+            logger.error(f"Failed to list environments: {e}")
+            return
+        
+        for row in rows:
+            yield dict(row)
+    
     def list_environments(self) -> List[Dict[str, Any]]:
         """
         List all stored environments.
@@ -195,27 +351,7 @@ class StateDatabase:
         Returns:
             List of dictionaries containing environment summary information
         """
-        try:
-            conn = sqlite3.connect(str(self.db_path))
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-            SELECT id, name, root_dir, created_at, last_accessed
-            FROM environments
-            ORDER BY last_accessed DESC
-            ''')
-            
-            rows = cursor.fetchall()
-            
-            # Convert rows to dictionaries
-            environments = [dict(row) for row in rows]
-            
-            conn.close()
-            return environments
-        except Exception as e:
-            logger.error(f"Failed to list environments: {e}")
-            return []
+        return list(self.iter_environments())
     
     def delete_environment(self, env_id: str) -> bool:
         """
@@ -228,14 +364,11 @@ class StateDatabase:
             bool: True if deletion was successful, False otherwise
         """
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
-            
-            cursor.execute("DELETE FROM environments WHERE id = ?", (env_id,))
-            conn.commit()
+            with self._lock:
+                self._pending_touch.pop(env_id, None)
+                cursor = self._conn.execute("DELETE FROM environments WHERE id = ?", (env_id,))
             
             deleted = cursor.rowcount > 0
-            conn.close()
             
             return deleted
         except Exception as e:
@@ -253,21 +386,20 @@ class StateDatabase:
             int: Number of environments purged
         """
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
-            
             # Calculate cutoff date
-            cutoff_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
+            cutoff_date = (
+                datetime.now(timezone.utc) - timedelta(days=days)
+            ).replace(tzinfo=None).isoformat()
             
             # Delete old environments
-            cursor.execute(
-                "DELETE FROM environments WHERE last_accessed < ?", 
-                (cutoff_date,)
-            )
+            with self._lock:
+                self._flush_touches()
+                cursor = self._conn.execute(
+                    "DELETE FROM environments WHERE last_accessed < ?", 
+                    (cutoff_date,)
+                )
             
             purged = cursor.rowcount
-            conn.commit()
-            conn.close()
             
             return purged
         except Exception as e:
@@ -275,9 +407,14 @@ class StateDatabase:
             return 0
 
 
+# Shared StateDatabase instances by database path
+_instances: Dict[Path, StateDatabase] = {}
+_instances_lock = threading.Lock()
+
+
 def get_state_db(db_path: Optional[Union[str, Path]] = None) -> StateDatabase:
     """
-    Get a StateDatabase instance.
+    Get the shared StateDatabase instance for a database path.
     
     Args:
         db_path: Optional custom database path
@@ -285,4 +422,14 @@ def get_state_db(db_path: Optional[Union[str, Path]] = None) -> StateDatabase:
     Returns:
         StateDatabase instance
     """
-    return StateDatabase(db_path) 
\ No newline at end of file
+    key = Path(db_path) if db_path else DEFAULT_DB_PATH
+    
+    with _instances_lock:
+        instance = _instances.get(key)
+        # Replace instances that were closed by a caller
+        if instance is None or instance._conn is None:
+            instance = _instances[key] = StateDatabase(key)
+            # Shared instances live until exit; write their pending updates then
+            atexit.register(instance.close)
+    
+    return instance 
\ No newline at end of file
@@ -5,59 +5,112 @@ This module provides predefined environment templates for common testing scenari
 These templates can be used to quickly set up specific testing environments.
 """
 
+import atexit
+import json
 import logging
+import os
+import queue
+import sys
+import threading
+import weakref
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Union, Any
+from typing import TYPE_CHECKING, ClassVar, Dict, Hashable, List, Optional, Tuple, Type, Union, Any
 
-from .environment import SafeEnvironment
-from .vm import VMConfig
-from .container import ContainerConfig
 from .utils import log_status, Colors
 
+if TYPE_CHECKING:
+    from .environment import SafeEnvironment
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Benchmark configuration written by PerformanceTestTemplate, serialized once
+_BENCHMARK_CONFIG = {
+    "iterations": 1000,
+    "warmup_iterations": 100,
+    "time_unit": "ms",
+    "include_overhead": True,
+    "save_results": True,
+    "output_format": ["json", "csv"],
+    "comparison_mode": "ratio"
+}
+_BENCHMARK_CONFIG_BYTES = json.dumps(_BENCHMARK_CONFIG, indent=2).encode("utf-8")
+
+# Template registry, filled in by EnvironmentTemplate.__init_subclass__
+TEMPLATE_REGISTRY: Dict[str, Type["EnvironmentTemplate"]] = {}
+
+# Templates are slotted dataclasses where supported (Python 3.10+)
+_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# Base environments created ahead of time by prewarm_pool()
+_ENV_POOL: "queue.Queue[SafeEnvironment]" = queue.Queue()
+
+# Environments created with create_from_template(reuse=True), by their
+# arguments; entries go away once callers drop the environment
+_ENV_CACHE: "weakref.WeakValueDictionary[Tuple[Hashable, ...], SafeEnvironment]" = (
+    weakref.WeakValueDictionary()
+)
+_ENV_CACHE_LOCK = threading.Lock()
+
+@dataclass(eq=False, **_DATACLASS_OPTIONS)
 class EnvironmentTemplate:
-    """Base class for environment templates"""
+    """
+    Base class for environment templates.
+    
+    Subclasses are dataclasses too, so their template-specific parameters
+    follow root_dir, internal_mode and sudo_password in the constructor.
+    """
     
-    name: str = "base"
-    description: str = "Base environment template"
+    template_id: ClassVar[Optional[str]] = None  # Registry key; None for abstract templates
+    name: ClassVar[str] = "base"
+    description: ClassVar[str] = "Base environment template"
     
-    def __init__(self, 
-                root_dir: Optional[Path] = None, 
-                internal_mode: bool = False,
-                sudo_password: Optional[str] = None) -> None:
-        """
-        Initialize environment template.
-        
-        Args:
-            root_dir: Root directory for the environment
-            internal_mode: Whether to use internal mode
-            sudo_password: Sudo password for operations requiring elevated privileges
-        """
-        self.root_dir = root_dir
-        self.internal_mode = internal_mode
-        self.sudo_password = sudo_password
-        self.env = None
+    root_dir: Optional[Path] = None  # Root directory for the environment
+    internal_mode: bool = False  # Whether to use internal mode
+    # For operations requiring elevated privileges; kept out of repr()
+    sudo_password: Optional[str] = field(default=None, repr=False)
+    env: Optional["SafeEnvironment"] = field(default=None, init=False, repr=False)
+    
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """Register each template subclass that declares a template_id"""
+        # Zero-argument super() would bind to the pre-slots class here
+        super(EnvironmentTemplate, cls).__init_subclass__(**kwargs)
+        # Slotted dataclasses are recreated after decoration, so the final
+        # class registers last and replaces the original
+        if cls.template_id:
+            TEMPLATE_REGISTRY[cls.template_id] = cls
     
-    def create(self) -> SafeEnvironment:
+    def create(self) -> "SafeEnvironment":
         """
         Create and configure the environment based on the template.
         
         Returns:
             SafeEnvironment: The configured environment
         """
-        # Create base environment
-        self.env = SafeEnvironment(
-            root_dir=self.root_dir,
-            internal_mode=self.internal_mode,
-            sudo_password=self.sudo_password
-        )
+        # Imported here so listing templates doesn't load the VM, container
+        # and network subsystems
+        from .environment import SafeEnvironment
+        
+        # Pooled environments live in a temporary directory, so they can
+        # only stand in for templates that didn't ask for a specific one
+        pooled = self.root_dir is None and not self.internal_mode
+        self.env = _take_pooled_env() if pooled else None
         
-        # Set up the environment directory
-        if not self.env.create():
-            logger.error(f"Failed to create environment for template {self.name}")
-            raise RuntimeError(f"Failed to create environment for template {self.name}")
+        if self.env is not None:
+            self.env.sudo_password = self.sudo_password
+        else:
+            # Create base environment
+            self.env = SafeEnvironment(
+                root_dir=self.root_dir,
+                internal_mode=self.internal_mode,
+                sudo_password=self.sudo_password
+            )
+            
+            # Set up the environment directory
+            if not self.env.create():
+                logger.error(f"Failed to create environment for template {self.name}")
+                raise RuntimeError(f"Failed to create environment for template {self.name}")
         
         # Apply template-specific configurations
         self._configure()
@@ -73,24 +126,35 @@ class EnvironmentTemplate:
         This is meant to be overridden by subclasses.
         """
         pass
+    
+    def _setup_comprehensive_testing(self) -> None:
+        """Set up comprehensive testing unless the environment already has it"""
+        if self.env.comprehensive_test_enabled:
+            return
+        
+        if not self.env.setup_comprehensive_testing():
+            logger.warning("Failed to set up comprehensive testing environment")
 
 
+@dataclass(eq=False, **_DATACLASS_OPTIONS)
 class BasicTestTemplate(EnvironmentTemplate):
     """Basic testing environment template"""
     
+    template_id = "basic"
     name = "basic_test"
     description = "Basic testing environment with minimal configuration"
     
     def _configure(self) -> None:
         """Configure basic testing environment"""
         # Set up comprehensive testing environment
-        if not self.env.setup_comprehensive_testing():
-            logger.warning("Failed to set up comprehensive testing environment")
+        self._setup_comprehensive_testing()
 
 
+@dataclass(eq=False, **_DATACLASS_OPTIONS)
 class IsolatedNetworkTemplate(EnvironmentTemplate):
     """Template for network isolation testing"""
     
+    template_id = "network"
     name = "isolated_network"
     description = "Environment with network isolation for testing network boundaries"
     
@@ -101,41 +165,21 @@ class IsolatedNetworkTemplate(EnvironmentTemplate):
             logger.warning("Failed to set up network isolation")
             
         # Set up comprehensive testing
-        if not self.env.setup_comprehensive_testing():
-            logger.warning("Failed to set up comprehensive testing environment")
+        self._setup_comprehensive_testing()
 
 
+@dataclass(eq=False, **_DATACLASS_OPTIONS)
 class VMBasedTemplate(EnvironmentTemplate):
     """Template for VM-based testing"""
     
+    template_id = "vm"
     name = "vm_based"
     description = "Environment with VM support for isolated execution testing"
     
-    def __init__(self, 
-                root_dir: Optional[Path] = None, 
-                internal_mode: bool = False,
-                sudo_password: Optional[str] = None,
-                memory: str = "2G",
-                cpus: int = 2,
-                disk_size: str = "10G",
-                headless: bool = True) -> None:
-        """
-        Initialize VM-based template.
-        
-        Args:
-            root_dir: Root directory for the environment
-            internal_mode: Whether to use internal mode
-            sudo_password: Sudo password for operations requiring elevated privileges
-            memory: Memory size for the VM
-            cpus: Number of CPUs for the VM
-            disk_size: Disk size for the VM
-            headless: Whether to run the VM in headless mode
-        """
-        super().__init__(root_dir, internal_mode, sudo_password)
-        self.memory = memory
-        self.cpus = cpus
-        self.disk_size = disk_size
-        self.headless = headless
+    memory: str = "2G"  # Memory size for the VM
+    cpus: int = 2  # Number of CPUs for the VM
+    disk_size: str = "10G"  # Disk size for the VM
+    headless: bool = True  # Whether to run the VM in headless mode
     
     def _configure(self) -> None:
         """Configure VM-based testing environment"""
@@ -149,50 +193,24 @@ class VMBasedTemplate(EnvironmentTemplate):
             logger.warning("Failed to set up VM")
         
         # Set up comprehensive testing
-        if not self.env.setup_comprehensive_testing():
-            logger.warning("Failed to set up comprehensive testing environment")
+        self._setup_comprehensive_testing()
 
 
+@dataclass(eq=False, **_DATACLASS_OPTIONS)
 class ContainerBasedTemplate(EnvironmentTemplate):
     """Template for container-based testing"""
     
+    template_id = "container"
     name = "container_based"
     description = "Environment with container support for isolated execution testing"
     
-    def __init__(self, 
-                root_dir: Optional[Path] = None, 
-                internal_mode: bool = False,
-                sudo_password: Optional[str] = None,
-                image: str = "alpine:latest",
-                memory: str = "512m",
-                cpus: float = 1.0,
-                storage_size: str = "5G",
-                network_enabled: bool = False,
-                privileged: bool = False,
-                mount_workspace: bool = True) -> None:
-        """
-        Initialize container-based template.
-        
-        Args:
-            root_dir: Root directory for the environment
-            internal_mode: Whether to use internal mode
-            sudo_password: Sudo password for operations requiring elevated privileges
-            image: Container image to use
-            memory: Memory limit for the container
-            cpus: CPU limit for the container
-            storage_size: Storage size for the container
-            network_enabled: Whether to enable networking
-            privileged: Whether to run in privileged mode
-            mount_workspace: Whether to mount the workspace directory
-        """
-        super().__init__(root_dir, internal_mode, sudo_password)
-        self.image = image
-        self.memory = memory
-        self.cpus = cpus
-        self.storage_size = storage_size
-        self.network_enabled = network_enabled
-        self.privileged = privileged
-        self.mount_workspace = mount_workspace
+    image: str = "alpine:latest"  # Container image to use
+    memory: str = "512m"  # Memory limit for the container
+    cpus: float = 1.0  # CPU limit for the container
+    storage_size: str = "5G"  # Storage size for the container
+    network_enabled: bool = False  # Whether to enable networking
+    privileged: bool = False  # Whether to run in privileged mode
+    mount_workspace: bool = True  # Whether to mount the workspace directory
     
     def _configure(self) -> None:
         """Configure container-based testing environment"""
@@ -209,53 +227,31 @@ class ContainerBasedTemplate(EnvironmentTemplate):
             logger.warning("Failed to set up container")
         
         # Set up comprehensive testing
-        if not self.env.setup_comprehensive_testing():
-            logger.warning("Failed to set up comprehensive testing environment")
+        self._setup_comprehensive_testing()
 
 
+@dataclass(eq=False, **_DATACLASS_OPTIONS)
 class ComprehensiveTemplate(EnvironmentTemplate):
     """Template for comprehensive testing with all features enabled"""
     
+    template_id = "comprehensive"
     name = "comprehensive"
     description = "Full-featured environment with network isolation, VM, container, and enhanced testing"
     
-    def __init__(self, 
-                root_dir: Optional[Path] = None, 
-                internal_mode: bool = False,
-                sudo_password: Optional[str] = None,
-                memory: str = "4G",
-                cpus: int = 4,
-                disk_size: str = "20G",
-                headless: bool = True,
-                container_image: str = "alpine:latest",
-                container_memory: str = "1g",
-                container_cpus: float = 2.0) -> None:
-        """
-        Initialize comprehensive template.
-        
-        Args:
-            root_dir: Root directory for the environment
-            internal_mode: Whether to use internal mode
-            sudo_password: Sudo password for operations requiring elevated privileges
-            memory: Memory size for the VM
-            cpus: Number of CPUs for the VM
-            disk_size: Disk size for the VM
-            headless: Whether to run the VM in headless mode
-            container_image: Container image to use
-            container_memory: Memory limit for the container
-            container_cpus: CPU limit for the container
-        """
-        super().__init__(root_dir, internal_mode, sudo_password)
-        self.memory = memory
-        self.cpus = cpus
-        self.disk_size = disk_size
-        self.headless = headless
-        self.container_image = container_image
-        self.container_memory = container_memory
-        self.container_cpus = container_cpus
+    memory: str = "4G"  # Memory size for the VM
+    cpus: int = 4  # Number of CPUs for the VM
+    disk_size: str = "20G"  # Disk size for the VM
+    headless: bool = True  # Whether to run the VM in headless mode
+    container_image: str = "alpine:latest"  # Container image to use
+    container_memory: str = "1g"  # Memory limit for the container
+    container_cpus: float = 2.0  # CPU limit for the container
     
     def _configure(self) -> None:
         """Configure comprehensive testing environment"""
+        # The steps run one after another: they all update the same
+        # SafeEnvironment and append to its .env file, and each may prompt
+        # sudo and log progress
+        
         # Set up network isolation
         if not self.env.setup_network_isolation():
             logger.warning("Failed to set up network isolation")
@@ -279,17 +275,18 @@ class ComprehensiveTemplate(EnvironmentTemplate):
             logger.warning("Failed to set up container")
         
         # Set up comprehensive testing environment
-        if not self.env.setup_comprehensive_testing():
-            logger.warning("Failed to set up comprehensive testing environment")
+        self._setup_comprehensive_testing()
         
         # Set up enhanced development environment
         if not self.env.setup_enhanced_environment():
             logger.warning("Failed to set up enhanced development environment")
 
 
+@dataclass(eq=False, **_DATACLASS_OPTIONS)
 class EnhancedDevelopmentTemplate(EnvironmentTemplate):
     """Template for enhanced development environment"""
     
+    template_id = "development"
     name = "enhanced_dev"
     description = "Environment optimized for development with IDE integration and tooling"
     
@@ -300,72 +297,117 @@ class EnhancedDevelopmentTemplate(EnvironmentTemplate):
             logger.warning("Failed to set up enhanced development environment")
         
         # Set up comprehensive testing as well
-        if not self.env.setup_comprehensive_testing():
-            logger.warning("Failed to set up comprehensive testing environment")
+        self._setup_comprehensive_testing()
 
 
+@dataclass(eq=False, **_DATACLASS_OPTIONS)
 class PerformanceTestTemplate(EnvironmentTemplate):
     """Template for performance testing"""
     
+    template_id = "performance"
     name = "performance_test"
     description = "Environment configured for performance benchmarking and testing"
     
     def _configure(self) -> None:
         """Configure performance testing environment"""
         # Set up comprehensive testing environment (includes benchmark tests)
-        if not self.env.setup_comprehensive_testing():
-            logger.warning("Failed to set up comprehensive testing environment")
+        self._setup_comprehensive_testing()
             
         # Create additional benchmark configuration directory
         benchmark_dir = self.env.root_dir / "benchmarks"
         benchmark_dir.mkdir(exist_ok=True)
         
         # Create benchmark configuration file
-        benchmark_config = {
-            "iterations": 1000,
-            "warmup_iterations": 100,
-            "time_unit": "ms",
-            "include_overhead": True,
-            "save_results": True,
-            "output_format": ["json", "csv"],
-            "comparison_mode": "ratio"
-        }
+        # A single unbuffered write is enough for this small file
+        fd = os.open(
+            benchmark_dir / "benchmark_config.json",
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+            0o644
+        )
+        try:
+            os.write(fd, _BENCHMARK_CONFIG_BYTES)
+        finally:
+            os.close(fd)
+
+
+def _take_pooled_env() -> Optional["SafeEnvironment"]:
+    """Take a pre-created environment from the pool, if there is one"""
+    try:
+        return _ENV_POOL.get_nowait()
+    except queue.Empty:
+        return None
+
+
+def prewarm_pool(count: int) -> int:
+    """
+    Create base environments ahead of time for templates to use.
+    
+    Templates without a root directory or internal mode take a pooled
+    environment instead of creating their own, and only apply their
+    configuration. Environments left in the pool are cleaned up at exit.
+    
+    Args:
+        count: Number of environments to create
         
-        with open(benchmark_dir / "benchmark_config.json", "w") as f:
-            import json
-            json.dump(benchmark_config, f, indent=2)
-
-
-# Template registry
-TEMPLATE_REGISTRY = {
-    "basic": BasicTestTemplate,
-    "network": IsolatedNetworkTemplate,
-    "vm": VMBasedTemplate,
-    "container": ContainerBasedTemplate,
-    "comprehensive": ComprehensiveTemplate,
-    "development": EnhancedDevelopmentTemplate,
-    "performance": PerformanceTestTemplate
-}
+    Returns:
+        int: Number of environments now in the pool
+    """
+    from .environment import SafeEnvironment
+    
+    def create_pooled_env() -> None:
+        env = SafeEnvironment()
+        # Internal mode (e.g. from settings) uses one fixed directory
+        if env.internal_mode:
+            return
+        if env.create():
+            _ENV_POOL.put(env)
+    
+    threads = [threading.Thread(target=create_pooled_env, daemon=True) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    return _ENV_POOL.qsize()
+
+
+def drain_pool() -> None:
+    """Clean up all environments left in the pool"""
+    while True:
+        env = _take_pooled_env()
+        if env is None:
+            return
+        env.cleanup()
+
+
+atexit.register(drain_pool)
+
+
+# Template information, built once since the registry is static
+_AVAILABLE_TEMPLATES = tuple(
+    {"id": template_id, "name": template_class.name, "description": template_class.description}
+    for template_id, template_class in TEMPLATE_REGISTRY.items()
+)
 
 
 def get_available_templates() -> List[Dict[str, str]]:
     """
     Get information about all available templates.
     
+    The dictionaries are shared between calls; callers must not modify them.
+    
     Returns:
         List[Dict[str, str]]: List of template information dictionaries
     """
-    return [
-        {"id": template_id, "name": template_class.name, "description": template_class.description}
-        for template_id, template_class in TEMPLATE_REGISTRY.items()
-    ]
+    return list(_AVAILABLE_TEMPLATES)
 
 
 def create_from_template(template_id: str, 
                         root_dir: Optional[Path] = None, 
                         internal_mode: bool = False,
                         sudo_password: Optional[str] = None,
-                        **kwargs: Any) -> Optional[SafeEnvironment]:
+                        reuse: bool = False,
+                        **kwargs: Any) -> Optional["SafeEnvironment"]:
     """
     Create a SafeEnvironment from a predefined template.
     
@@ -374,6 +416,10 @@ def create_from_template(template_id: str,
         root_dir: Root directory for the environment
         internal_mode: Whether to use internal mode
         sudo_password: Sudo password for operations requiring elevated privileges
+        reuse: Return the environment from an earlier call with the same
+            arguments if it is still referenced and its directory exists.
+            Environments created with a sudo password are never cached, so
+            the password is not kept alive in a module-level key
         **kwargs: Additional template-specific arguments
         
     Returns:
@@ -384,6 +430,20 @@ def create_from_template(template_id: str,
         logger.error(f"Template '{template_id}' not found")
         return None
     
+    key = None
+    if reuse and sudo_password is None:
+        try:
+            key = (template_id, root_dir, internal_mode, frozenset(kwargs.items()))
+            with _ENV_CACHE_LOCK:
+                env = _ENV_CACHE.get(key)
+        except TypeError:
+            # Unhashable template arguments can't be cached
+            key = env = None
+        
+        if env is not None and env.root_dir.exists():
+            logger.debug(f"Reusing environment for template {template_id} at {env.root_dir}")
+            return env
+    
     template = template_class(
         root_dir=root_dir,
         internal_mode=internal_mode,
@@ -391,4 +451,8 @@ def create_from_template(template_id: str,
         **kwargs
     )
     
-    return template.create() 
\ No newline at end of file
+    env = template.create()
+    if key is not None:
+        with _ENV_CACHE_LOCK:
+            _ENV_CACHE[key] = env
+    return env 
\ No newline at end of file
@@ -8,127 +8,21 @@ automates common testing tasks.
 
 import logging
 import os
-import shutil
-import subprocess
 from pathlib import Path
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Tuple, Union
 import atexit
 
-from .utils import log_status, Colors, run_command, create_secure_directory
-from .settings import get_settings
+from .utils import log_status, Colors
 from .artifact_cache import get_test_artifact_cache
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-class TestEnvironment:
-    """Manages testing and development environments for SafeSpace"""
-    
-    def __init__(self, env_dir: Path):
-        """
-        Initialize TestEnvironment.
-        
-        Args:
-            env_dir: Path to the environment directory
-        """
-        # Get settings
-        self.settings = get_settings()
-        self.testing_settings = self.settings.testing
-        self.enhanced_dev_settings = self.settings.enhanced_dev
-        
-        self.env_dir = env_dir
-        self.config_dir = env_dir / "config"
-        self.tests_dir = env_dir / "tests"
-        self.scripts_dir = env_dir / "scripts"
-        self.docs_dir = env_dir / "docs"
-        self.src_dir = env_dir / "src"
-        self.tools_dir = env_dir / "tools"
-        self.notebooks_dir = env_dir / "notebooks"
-        self.github_dir = env_dir / ".github"
-        self.vscode_dir = env_dir / ".vscode"
-    
-    def setup_comprehensive_testing(self) -> bool:
-        """
-        Set up a comprehensive testing environment.
-        
-        Returns:
-            bool: True if setup was successful, False otherwise
-        """
-        log_status("Setting up comprehensive testing environment...", Colors.YELLOW)
-        
-        try:
-            # Create directories
-            create_secure_directory(self.config_dir / "test")
-            create_secure_directory(self.tests_dir)
-            
-            # Create setup.cfg
-            self._create_setup_cfg()
-            
-            # Create tox configuration
-            self._create_tox_ini()
-            
-            # Create test runner script
-            self._create_test_runner()
-            
-            # Create requirements.txt
-            self._create_testing_requirements()
-            
-            # Create example benchmark test
-            self._create_benchmark_test()
-            
-            log_status("Comprehensive testing environment setup complete", Colors.GREEN)
-            self._print_testing_info()
-            return True
-        except Exception as e:
-            logger.error(f"Failed to set up comprehensive testing environment: {e}")
-            return False
-    
-    def setup_enhanced_environment(self) -> bool:
-        """
-        Set up an enhanced development environment.
-        
-        Returns:
-            bool: True if setup was successful, False otherwise
-        """
-        log_status("Setting up enhanced development environment...", Colors.YELLOW)
-        
-        try:
-            # Create enhanced directory structure
-            directories = [
-                self.vscode_dir,
-                self.github_dir / "workflows",
-                self.scripts_dir,
-                self.docs_dir / "api",
-                self.docs_dir / "guides",
-                self.tools_dir,
-                self.notebooks_dir
-            ]
-            
-            for directory in directories:
-                create_secure_directory(directory)
-            
-            # Create VS Code settings
-            self._create_vscode_settings()
-            
-            # Create GitHub Actions workflow
-            self._create_github_workflow()
-            
-            # Create development scripts
-            self._create_dev_scripts()
-            
-            # Create pre-commit config
-            self._create_precommit_config()
-            
-            log_status("Enhanced development environment setup complete", Colors.GREEN)
-            self._print_enhanced_info()
-            return True
-        except Exception as e:
-            logger.error(f"Failed to set up enhanced development environment: {e}")
-            return False
-    
-    def _create_setup_cfg(self) -> None:
-        """Create setup.cfg configuration file"""
-        setup_cfg_content = """[flake8]
+# A generated file: path, contents and whether it should be executable
+GeneratedFile = Tuple[str, bytes, bool]
+
+# Contents of the files generated by TestEnvironment, encoded once at import
+_SETUP_CFG = b"""[flake8]
 max-line-length = 88
 extend-ignore = E203
 exclude = .git,__pycache__,build,dist,*.egg-info
@@ -152,12 +46,8 @@ exclude_lines = [
     "if TYPE_CHECKING:",
 ]
 """
-        with open(self.env_dir / "setup.cfg", "w") as f:
-            f.write(setup_cfg_content)
-    
-    def _create_tox_ini(self) -> None:
-        """Create tox.ini configuration file"""
-        tox_ini_content = """[tox]
+
+_TOX_INI = b"""[tox]
 envlist = py39, py310, py311, lint, type
 isolated_build = True
 
@@ -197,12 +87,8 @@ commands =
     bandit -r src tests
     safety check
 """
-        with open(self.env_dir / "tox.ini", "w") as f:
-            f.write(tox_ini_content)
-    
-    def _create_test_runner(self) -> None:
-        """Create comprehensive test runner script"""
-        test_runner_content = """#!/bin/bash
+
+_TEST_RUNNER = b"""#!/bin/bash
 set -euo pipefail
 
 # Colors for output
@@ -259,16 +145,8 @@ echo "- Coverage report: htmlcov/index.html"
 echo "- Profile results: profile_results.html"
 echo "- API documentation: docs/api/index.html"
 """
-        script_path = self.env_dir / "run_tests.sh"
-        with open(script_path, "w") as f:
-            f.write(test_runner_content)
-            
-        # Make script executable
-        os.chmod(script_path, 0o755)
-    
-    def _create_testing_requirements(self) -> None:
-        """Create requirements.txt with comprehensive testing tools"""
-        requirements_content = """# Testing
+
+_TESTING_REQUIREMENTS = b"""# Testing
 pytest>=7.0.0
 pytest-cov>=4.0.0
 pytest-xdist>=3.0.0
@@ -301,12 +179,8 @@ pyinstrument>=4.4.0
 pre-commit>=3.2.2
 tox>=4.5.1
 """
-        with open(self.env_dir / "requirements.txt", "w") as f:
-            f.write(requirements_content)
-    
-    def _create_benchmark_test(self) -> None:
-        """Create example benchmark test"""
-        benchmark_test_content = """import pytest
+
+_BENCHMARK_TEST = b"""import pytest
 from hypothesis import given, strategies as st
 
 def fibonacci(n: int) -> int:
@@ -325,27 +199,8 @@ def test_fibonacci_property(n):
     if n <= 1:
         assert result == n
 """
-        create_secure_directory(self.tests_dir)
-        with open(self.tests_dir / "test_benchmark.py", "w") as f:
-            f.write(benchmark_test_content)
-    
-    def _print_testing_info(self) -> None:
-        """Print information about the testing environment"""
-        log_status("\nAvailable testing commands:", Colors.CYAN)
-        log_status("1. ./run_tests.sh - Run complete test suite with all checks", Colors.WHITE)
-        log_status("2. pytest tests/ - Run basic tests", Colors.WHITE)
-        log_status("3. pytest tests/ --benchmark-only - Run benchmarks", Colors.WHITE)
-        log_status("4. pre-commit run --all-files - Run all pre-commit hooks", Colors.WHITE)
-        log_status("5. tox - Run tests in multiple Python versions", Colors.WHITE)
-        
-        log_status("\nTesting artifacts:", Colors.CYAN)
-        log_status("- Coverage report: htmlcov/index.html", Colors.WHITE)
-        log_status("- Profile results: profile_results.html", Colors.WHITE)
-        log_status("- API documentation: docs/api/index.html", Colors.WHITE)
-    
-    def _create_vscode_settings(self) -> None:
-        """Create VS Code settings"""
-        vscode_settings = """{
+
+_VSCODE_SETTINGS = b"""{
     "python.linting.enabled": true,
     "python.linting.pylintEnabled": true,
     "python.linting.mypyEnabled": true,
@@ -362,12 +217,8 @@ def test_fibonacci_property(n):
         "tests"
     ]
 }"""
-        with open(self.vscode_dir / "settings.json", "w") as f:
-            f.write(vscode_settings)
-    
-    def _create_github_workflow(self) -> None:
-        """Create GitHub Actions workflow"""
-        github_workflow = """name: Test
+
+_GITHUB_WORKFLOW = b"""name: Test
 
 on: [push, pull_request]
 
@@ -396,12 +247,8 @@ jobs:
       with:
         file: ./coverage.xml
 """
-        with open(self.github_dir / "workflows" / "test.yml", "w") as f:
-            f.write(github_workflow)
-    
-    def _create_dev_scripts(self) -> None:
-        """Create development scripts"""
-        setup_dev_script = """#!/bin/bash
+
+_SETUP_DEV_SCRIPT = b"""#!/bin/bash
 set -euo pipefail
 
 # Install development tools
@@ -420,8 +267,8 @@ mkdir -p src tests
 
 echo "Development environment setup complete!"
 """
-        
-        update_deps_script = """#!/bin/bash
+
+_UPDATE_DEPS_SCRIPT = b"""#!/bin/bash
 set -euo pipefail
 
 # Update all dependencies to latest versions
@@ -438,21 +285,8 @@ fi
 
 echo "Dependencies updated successfully!"
 """
-        
-        # Make scripts executable
-        script_path = self.scripts_dir / "setup_dev.sh"
-        with open(script_path, "w") as f:
-            f.write(setup_dev_script)
-        os.chmod(script_path, 0o755)
-        
-        script_path = self.scripts_dir / "update_deps.sh"
-        with open(script_path, "w") as f:
-            f.write(update_deps_script)
-        os.chmod(script_path, 0o755)
-    
-    def _create_precommit_config(self) -> None:
-        """Create pre-commit configuration"""
-        precommit_config = """repos:
+
+_PRECOMMIT_CONFIG = b"""repos:
 -   repo: https://github.com/pre-commit/pre-commit-hooks
     rev: v4.4.0
     hooks:
@@ -494,8 +328,239 @@ echo "Dependencies updated successfully!"
         args: ["-c", "pyproject.toml"]
         additional_dependencies: ["bandit[toml]"]
 """
-        with open(self.env_dir / ".pre-commit-config.yaml", "w") as f:
-            f.write(precommit_config)
+
+class TestEnvironment:
+    """Manages testing and development environments for SafeSpace"""
+    
+    __slots__ = (
+        'settings', 'testing_settings', 'enhanced_dev_settings',
+        'env_dir', 'config_dir', 'tests_dir', 'scripts_dir', 'docs_dir',
+        'src_dir', 'tools_dir', 'notebooks_dir', 'github_dir', 'vscode_dir',
+        '_setup_cfg_path', '_tox_ini_path', '_test_runner_path',
+        '_requirements_path', '_benchmark_test_path', '_vscode_settings_path',
+        '_github_workflow_path', '_setup_dev_path', '_update_deps_path',
+        '_precommit_config_path',
+    )
+    
+    def __init__(self, env_dir: Path):
+        """
+        Initialize TestEnvironment.
+        
+        Args:
+            env_dir: Path to the environment directory
+        """
+        # Imported here so importing this module doesn't load the settings
+        from .settings import get_settings
+        
+        # Get settings
+        self.settings = get_settings()
+        self.testing_settings = self.settings.testing
+        self.enhanced_dev_settings = self.settings.enhanced_dev
+        
+        self.env_dir = env_dir
+        self.config_dir = env_dir / "config"
+        self.tests_dir = env_dir / "tests"
+        self.scripts_dir = env_dir / "scripts"
+        self.docs_dir = env_dir / "docs"
+        self.src_dir = env_dir / "src"
+        self.tools_dir = env_dir / "tools"
+        self.notebooks_dir = env_dir / "notebooks"
+        self.github_dir = env_dir / ".github"
+        self.vscode_dir = env_dir / ".vscode"
+        
+        # Paths of the generated files, as strings for os.open()
+        self._setup_cfg_path = os.fspath(env_dir / "setup.cfg")
+        self._tox_ini_path = os.fspath(env_dir / "tox.ini")
+        self._test_runner_path = os.fspath(env_dir / "run_tests.sh")
+        self._requirements_path = os.fspath(env_dir / "requirements.txt")
+        self._benchmark_test_path = os.fspath(self.tests_dir / "test_benchmark.py")
+        self._vscode_settings_path = os.fspath(self.vscode_dir / "settings.json")
+        self._github_workflow_path = os.fspath(self.github_dir / "workflows" / "test.yml")
+        self._setup_dev_path = os.fspath(self.scripts_dir / "setup_dev.sh")
+        self._update_deps_path = os.fspath(self.scripts_dir / "update_deps.sh")
+        self._precommit_config_path = os.fspath(env_dir / ".pre-commit-config.yaml")
+    
+    def setup_comprehensive_testing(self) -> bool:
+        """
+        Set up a comprehensive testing environment.
+        
+        Returns:
+            bool: True if setup was successful, False otherwise
+        """
+        log_status("Setting up comprehensive testing environment...", Colors.YELLOW)
+        
+        try:
+            # Create directories
+            self._create_directories([self.config_dir / "test", self.tests_dir])
+            
+            files: List[GeneratedFile] = []
+            
+            # Create setup.cfg
+            files += self._create_setup_cfg()
+            
+            # Create tox configuration
+            files += self._create_tox_ini()
+            
+            # Create test runner script
+            files += self._create_test_runner()
+            
+            # Create requirements.txt
+            files += self._create_testing_requirements()
+            
+            # Create example benchmark test
+            files += self._create_benchmark_test()
+            
+            self._write_files(files)
+            
+            log_status("Comprehensive testing environment setup complete", Colors.GREEN)
+            self._print_testing_info()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to set up comprehensive testing environment: {e}")
+            return False
+    
+    def setup_enhanced_environment(self) -> bool:
+        """
+        Set up an enhanced development environment.
+        
+        Returns:
+            bool: True if setup was successful, False otherwise
+        """
+        log_status("Setting up enhanced development environment...", Colors.YELLOW)
+        
+        try:
+            # Create enhanced directory structure
+            directories = [
+                self.vscode_dir,
+                self.github_dir / "workflows",
+                self.scripts_dir,
+                self.docs_dir / "api",
+                self.docs_dir / "guides",
+                self.tools_dir,
+                self.notebooks_dir
+            ]
+            self._create_directories(directories)
+            
+            files: List[GeneratedFile] = []
+            
+            # Create VS Code settings
+            files += self._create_vscode_settings()
+            
+            # Create GitHub Actions workflow
+            files += self._create_github_workflow()
+            
+            # Create development scripts
+            files += self._create_dev_scripts()
+            
+            # Create pre-commit config
+            files += self._create_precommit_config()
+            
+            self._write_files(files)
+            
+            log_status("Enhanced development environment setup complete", Colors.GREEN)
+            self._print_enhanced_info()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to set up enhanced development environment: {e}")
+            return False
+    
+    def _create_directories(self, directories: List[Path]) -> None:
+        """
+        Create directories inside the environment with owner-only permissions.
+        
+        Shared parents are created once, shallowest first, keeping the
+        default permissions that mkdir(parents=True) would give them.
+        
+        Args:
+            directories: Directories under env_dir to create
+        """
+        self.env_dir.mkdir(parents=True, exist_ok=True)
+        
+        pending = set()
+        for directory in directories:
+            path = directory
+            while path != self.env_dir and path not in pending and path != path.parent:
+                pending.add(path)
+                path = path.parent
+        
+        for path in sorted(pending, key=lambda p: len(p.parts)):
+            path.mkdir(exist_ok=True)
+        
+        for directory in directories:
+            directory.chmod(0o700)
+    
+    def _write_files(self, files: List[GeneratedFile]) -> None:
+        """
+        Write generated files straight to their file descriptors.
+        
+        Args:
+            files: Files to write, as returned by the _create_* methods
+        """
+        for path, data, executable in files:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+            
+            # Make scripts executable
+            if executable:
+                os.chmod(path, 0o755)
+    
+    def _create_setup_cfg(self) -> List[GeneratedFile]:
+        """Create setup.cfg configuration file"""
+        return [(self._setup_cfg_path, _SETUP_CFG, False)]
+    
+    def _create_tox_ini(self) -> List[GeneratedFile]:
+        """Create tox.ini configuration file"""
+        return [(self._tox_ini_path, _TOX_INI, False)]
+    
+    def _create_test_runner(self) -> List[GeneratedFile]:
+        """Create comprehensive test runner script"""
+        return [(self._test_runner_path, _TEST_RUNNER, True)]
+    
+    def _create_testing_requirements(self) -> List[GeneratedFile]:
+        """Create requirements.txt with comprehensive testing tools"""
+        return [(self._requirements_path, _TESTING_REQUIREMENTS, False)]
+    
+    def _create_benchmark_test(self) -> List[GeneratedFile]:
+        """Create example benchmark test"""
+        return [(self._benchmark_test_path, _BENCHMARK_TEST, False)]
+    
+    def _print_testing_info(self) -> None:
+        """Print information about the testing environment"""
+        log_status("\nAvailable testing commands:", Colors.CYAN)
+        log_status("1. ./run_tests.sh - Run complete test suite with all checks", Colors.WHITE)
+        log_status("2. pytest tests/ - Run basic tests", Colors.WHITE)
+        log_status("3. pytest tests/ --benchmark-only - Run benchmarks", Colors.WHITE)
+        log_status("4. pre-commit run --all-files - Run all pre-commit hooks", Colors.WHITE)
+        log_status("5. tox - Run tests in multiple Python versions", Colors.WHITE)
+        
+        log_status("\nTesting artifacts:", Colors.CYAN)
+        log_status("- Coverage report: htmlcov/index.html", Colors.WHITE)
+        log_status("- Profile results: profile_results.html", Colors.WHITE)
+        log_status("- API documentation: docs/api/index.html", Colors.WHITE)
+    
+    def _create_vscode_settings(self) -> List[GeneratedFile]:
+        """Create VS Code settings"""
+        return [(self._vscode_settings_path, _VSCODE_SETTINGS, False)]
+    
+    def _create_github_workflow(self) -> List[GeneratedFile]:
+        """Create GitHub Actions workflow"""
+        return [(self._github_workflow_path, _GITHUB_WORKFLOW, False)]
+    
+    def _create_dev_scripts(self) -> List[GeneratedFile]:
+        """Create development scripts"""
+        return [
+            (self._setup_dev_path, _SETUP_DEV_SCRIPT, True),
+            (self._update_deps_path, _UPDATE_DEPS_SCRIPT, True),
+        ]
+    
+    def _create_precommit_config(self) -> List[GeneratedFile]:
+        """Create pre-commit configuration"""
+        return [(self._precommit_config_path, _PRECOMMIT_CONFIG, False)]
     
     def _print_enhanced_info(self) -> None:
         """Print information about the enhanced environment"""
@@ -512,28 +577,32 @@ echo "Dependencies updated successfully!"
     
     def cleanup(self) -> None:
         """Clean up testing environment artifacts"""
-        log_status("Cleaning up testing environment artifacts...", Colors.YELLOW)
-        
-        # Remove pytest cache
-        for cache_dir in self.env_dir.glob("**/__pycache__"):
-            if cache_dir.is_dir():
-                shutil.rmtree(cache_dir)
-        
-        for pytest_cache in self.env_dir.glob("**/.pytest_cache"):
-            if pytest_cache.is_dir():
-                shutil.rmtree(pytest_cache)
-        
-        # Clean coverage data
-        for coverage_file in self.env_dir.glob(".coverage*"):
-            coverage_file.unlink()
+        import shutil
         
-        htmlcov_dir = self.env_dir / "htmlcov"
-        if htmlcov_dir.exists():
-            shutil.rmtree(htmlcov_dir)
+        log_status("Cleaning up testing environment artifacts...", Colors.YELLOW)
         
-        # Remove any profiling results
-        for profile_file in self.env_dir.glob("profile_results*.html"):
-            profile_file.unlink()
+        # Walk the tree once, removing caches at any depth and coverage and
+        # profiling output at the top level
+        env_root = os.fspath(self.env_dir)
+        for dirpath, dirnames, filenames in os.walk(env_root):
+            top_level = dirpath == env_root
+            
+            # Remove pytest and bytecode caches, and the coverage report,
+            # without descending into them
+            for name in list(dirnames):
+                if name in ("__pycache__", ".pytest_cache") or (top_level and name == "htmlcov"):
+                    shutil.rmtree(os.path.join(dirpath, name))
+                    dirnames.remove(name)
+            
+            if not top_level:
+                continue
+            
+            # Clean coverage data and any profiling results
+            for name in filenames:
+                if name.startswith(".coverage") or (
+                    name.startswith("profile_results") and name.endswith(".html")
+                ):
+                    os.unlink(os.path.join(dirpath, name))
         
         log_status("Testing environment artifacts cleaned up", Colors.GREEN)
 
@@ -21,6 +21,7 @@ setup(
     ],
     extras_require={
         "network": ["pyroute2>=0.7.0"],
+        "speedups": ["orjson>=3.9.0"],
         "vm": ["qemu.py>=0.1.0"],
         "test": ["pytest>=7.0.0", "pytest-cov>=4.0.0"],
         "dev": [